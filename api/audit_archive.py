@@ -0,0 +1,153 @@
+"""Module for archiving old audit rows into compressed segment files."""
+
+# Third party Imports
+import glob
+import gzip
+import json
+import os
+from datetime import datetime as dt
+from itertools import islice
+
+from sqlalchemy import select
+
+# Database
+from api.database import db
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+SEGMENT_DATE_FORMAT = '%Y-%m-%d'
+SEGMENT_SUFFIX = '.jsonl.gz'
+
+
+class AuditArchive(object):
+    """
+    Archive of audit rows kept as gzip compressed JSON lines, one segment
+    file per day of `created_date`.
+
+    Rows are moved in batches, each appended to its segments (a new gzip
+    member per batch) and synced before being deleted from the table in a
+    short transaction. A batch interrupted between both steps is archived
+    again by the next run, so readers drop rows already seen by id.
+    """
+
+    def __init__(self, path, table):
+        self.path = path
+        self.table = table
+
+    def archive(self, cutoff, batch_size=1000):
+        """
+        Move the audit rows created before `cutoff` into the archive
+
+        Args:
+            cutoff (datetime): Rows created before this date are archived
+            batch_size (int): Number of rows moved per transaction
+
+        Returns:
+            int: Number of archived rows
+        """
+        archived = 0
+
+        while True:
+            rows = db.session.execute(
+                select([self.table])
+                .where(self.table.c.created_date < cutoff)
+                .order_by(self.table.c.id)
+                .limit(batch_size)).fetchall()
+            if not rows:
+                return archived
+
+            self.write([dict(row) for row in rows])
+            db.session.execute(
+                self.table.delete().where(self.table.c.id.in_([row.id for row in rows])))
+            db.session.commit()
+            archived += len(rows)
+
+    def write(self, rows):
+        """ Append rows to the segments of their creation day """
+        os.makedirs(self.path, exist_ok=True)
+        segments = {}
+        for row in rows:
+            segments.setdefault(row['created_date'].strftime(SEGMENT_DATE_FORMAT), []).append(row)
+
+        for day, segment_rows in segments.items():
+            with open(self.segment_path(day), 'ab') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='ab') as segment:
+                    for row in segment_rows:
+                        segment.write((json.dumps(self.serialize(row)) + '\n').encode())
+                raw.flush()
+                os.fsync(raw.fileno())
+
+    def page(self, resource_type, cursor=None, limit=50, **filters):
+        """
+        Return archived rows of a resource type with an id below `cursor`,
+        newest first, reading the segments from the newest day backwards
+
+        Args:
+            resource_type (str): Type of the audited resources
+            cursor (int): Id of the last audit already returned
+            limit (int): Maximum number of rows to return
+            filters: Optional action, resource_id, created_from and created_to
+
+        Returns:
+            list: Rows of the archived audits as dicts
+        """
+        return list(islice(self.rows(resource_type, cursor, **filters), limit))
+
+    def rows(self, resource_type, cursor=None, **filters):
+        """
+        Yield the archived rows of a resource type with an id below `cursor`,
+        newest first, reading one segment at a time from the newest day
+        backwards, see `page`
+        """
+        created_from, created_to = filters.get('created_from'), filters.get('created_to')
+
+        for day in self.days():
+            if created_to is not None and day > created_to.date():
+                continue
+            if created_from is not None and day < created_from.date():
+                break
+
+            rows = {}
+            for row in self.read(day):
+                if cursor is not None and row['id'] >= cursor:
+                    continue
+                if row['resource_type'] != resource_type:
+                    continue
+                if any(filters.get(field) is not None and row[field] != filters[field]
+                       for field in ('action', 'resource_id')):
+                    continue
+                if created_from is not None and row['created_date'] < created_from:
+                    continue
+                if created_to is not None and row['created_date'] >= created_to:
+                    continue
+                rows[row['id']] = row
+
+            yield from sorted(rows.values(), key=lambda row: row['id'], reverse=True)
+
+    def days(self):
+        """ Days of the archived segments, newest first """
+        return sorted(
+            (dt.strptime(os.path.basename(path)[:-len(SEGMENT_SUFFIX)], SEGMENT_DATE_FORMAT).date()
+             for path in glob.glob(os.path.join(self.path, f'*{SEGMENT_SUFFIX}'))),
+            reverse=True)
+
+    def read(self, day):
+        with gzip.open(self.segment_path(day.strftime(SEGMENT_DATE_FORMAT)), 'rt') as segment:
+            for line in segment:
+                yield self.deserialize(json.loads(line))
+
+    def segment_path(self, day):
+        return os.path.join(self.path, f'{day}{SEGMENT_SUFFIX}')
+
+    @staticmethod
+    def serialize(row):
+        return {
+            field: value.strftime(DATE_FORMAT) if isinstance(value, dt) else value
+            for field, value in row.items()
+        }
+
+    @staticmethod
+    def deserialize(row):
+        for field in ('created_date', 'modified_date'):
+            if row.get(field) is not None:
+                row[field] = dt.strptime(row[field], DATE_FORMAT)
+        return row
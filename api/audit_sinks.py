@@ -0,0 +1,226 @@
+"""Module for the sinks receiving audit entries."""
+
+# Third party Imports
+import atexit
+import fcntl
+import glob
+import json
+import os
+import threading
+from datetime import datetime as dt
+
+from sqlalchemy import event
+
+# Database
+from api.database import db
+from api.models import Audit
+from api.audit_archive import DATE_FORMAT
+
+
+class AuditSink(object):
+    """Base class of the sinks receiving the entries logged by `Audit.log`."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def write(self, entry):
+        raise NotImplementedError(
+            "The write method must be overridden in all audit sinks")  #noqa
+
+    def write_many(self, entries):
+        """ Receive a batch of entries logged together """
+        for entry in entries:
+            self.write(entry)
+
+    def close(self):
+        """ Release the sink at worker shutdown """
+        pass
+
+
+class SyncAuditSink(AuditSink):
+    """
+    Saves each entry as an Audit row in the transaction of the change
+    being audited.
+    """
+
+    def write(self, entry):
+        return Audit(**entry).save()
+
+    def write_many(self, entries):
+        """ Insert the batch with one executemany INSERT """
+        db.session.execute(Audit.__table__.insert(), entries)
+
+
+class BufferedAuditSink(AuditSink):
+    """
+    Write-behind sink taking audit inserts off the request path.
+
+    Entries logged in a session are handed over once that session commits
+    and dropped when it rolls back. Each entry is appended to a local spool
+    file before it is buffered, and the buffer is bulk inserted once it
+    holds `AUDIT_BUFFER_SIZE` entries or every `AUDIT_FLUSH_INTERVAL`
+    seconds. Every worker process spools to its own file, locked for as
+    long as the worker runs, so spool files left over by a crashed worker
+    are replayed when the next sink starts and entries survive until they
+    are inserted.
+
+    A flush rotates the spool file out into a segment holding the buffered
+    entries. Segments stay locked until their entries are inserted and
+    are only removed then, so entries of a failed insert are retried by
+    the next flush from their own segment and never spooled twice.
+    """
+
+    def __init__(self, app):
+        super(BufferedAuditSink, self).__init__(app)
+        self.size = app.config['AUDIT_BUFFER_SIZE']
+        self.interval = app.config['AUDIT_FLUSH_INTERVAL']
+        self.spool_path = app.config['AUDIT_SPOOL_PATH']
+
+        self.buffer = []
+        self.segments = []
+        self.lock = threading.RLock()
+        self.flushing = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.segment = 0
+        self.pid = None
+        self.spool = None
+
+        self.recover()
+        self.open_spool()
+
+        event.listen(db.session, 'after_commit', self.after_commit)
+        event.listen(db.session, 'after_soft_rollback', self.after_rollback)
+
+    def write(self, entry):
+        entry = dict(entry, created_date=dt.utcnow())
+        db.session.info.setdefault('audit_entries', []).append(entry)
+
+    def after_commit(self, session):
+        entries = session.info.pop('audit_entries', None)
+        if entries:
+            try:
+                self.enqueue(entries)
+            except Exception:
+                # the audited change is committed, its entries stay spooled
+                self.app.logger.exception('Flushing the audit buffer failed')
+
+    def after_rollback(self, session, previous_transaction):
+        session.info.pop('audit_entries', None)
+
+    def enqueue(self, entries):
+        """ Spool and buffer committed entries, flushing a full buffer """
+        with self.lock:
+            if self.pid != os.getpid():
+                # the sink was created before the worker process forked
+                self.open_spool()
+            for entry in entries:
+                self.spool.write(json.dumps(
+                    dict(entry, created_date=entry['created_date'].strftime(DATE_FORMAT))) + '\n')
+            self.spool.flush()
+            self.buffer.extend(entries)
+            full = len(self.buffer) >= self.size
+
+        self.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        """
+        Bulk insert the buffered entries, and those of earlier segments whose
+        insert failed, oldest first. The buffer lock is only held to rotate
+        the spool, requests keep buffering entries during the inserts.
+        """
+        with self.flushing:
+            with self.lock:
+                if self.buffer:
+                    self.segments.append(self.rotate() + (self.buffer,))
+                    self.buffer = []
+                segments = list(self.segments)
+
+            for segment, path, entries in segments:
+                self.insert(entries)
+                os.remove(path)
+                segment.close()
+                with self.lock:
+                    self.segments.remove((segment, path, entries))
+
+    def insert(self, entries):
+        db.get_engine(self.app).execute(Audit.__table__.insert(), entries)
+
+    def open_spool(self):
+        """ Open and lock the spool file of the current worker process """
+        self.pid = os.getpid()
+        self.spool = open(f'{self.spool_path}.{self.pid}', 'a')
+        fcntl.flock(self.spool, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def rotate(self):
+        """
+        Move the current spool file aside, still locked, and open a fresh one
+        """
+        segment = self.spool
+        segment.flush()
+        self.segment += 1
+        path = f'{segment.name}.{self.segment}'
+        os.rename(segment.name, path)
+        self.open_spool()
+        return segment, path
+
+    def recover(self):
+        """ Insert the entries of spool files left over by stopped workers """
+        for path in sorted(glob.glob(f'{self.spool_path}.*')):
+            with open(path) as spool:
+                try:
+                    fcntl.flock(spool, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    # spooled by a running worker
+                    continue
+                entries = [json.loads(line) for line in spool if line.strip()]
+                for entry in entries:
+                    entry['created_date'] = dt.strptime(entry['created_date'], DATE_FORMAT)
+                if entries:
+                    self.insert(entries)
+                os.remove(path)
+
+    def start(self):
+        """ Start the periodic flush in the current worker process """
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                # entries stay buffered and spooled until the next attempt
+                pass
+
+    def close(self):
+        """ Drain the buffer at worker shutdown """
+        self.stopped.set()
+        event.remove(db.session, 'after_commit', self.after_commit)
+        event.remove(db.session, 'after_soft_rollback', self.after_rollback)
+        try:
+            self.flush()
+        finally:
+            # segments left over are replayed by the next sink
+            for segment, path, entries in self.segments:
+                segment.close()
+            if not self.buffer and self.pid == os.getpid() and os.path.exists(self.spool.name):
+                os.remove(self.spool.name)
+            self.spool.close()
+
+
+AUDIT_SINKS = {
+    'sync': SyncAuditSink,
+    'buffered': BufferedAuditSink,
+}
+
+
+def init_audit_sink(app):
+    """ Attach the audit sink of the configured AUDIT_SINK to the app """
+    sink = AUDIT_SINKS[app.config['AUDIT_SINK']](app)
+    app.extensions['audit_sink'] = sink
+    atexit.register(sink.close)
+    return sink
@@ -0,0 +1,125 @@
+"""Module for the negotiated compression of the API responses."""
+
+# Third party Imports
+import gzip
+import zlib
+
+from flask import request
+from werkzeug.http import unquote_etag, quote_etag
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class GzipEncoder(object):
+    """ Gzip stream, flushed after every chunk of a streamed response """
+
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk):
+        return self.compressor.compress(chunk) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush(zlib.Z_FINISH)
+
+    @staticmethod
+    def compress_all(data, level):
+        return gzip.compress(data, level)
+
+
+class BrotliEncoder(object):
+    """ Brotli stream, flushed after every chunk of a streamed response """
+
+    def __init__(self, level):
+        self.compressor = brotli.Compressor(quality=min(level, 11))
+
+    def compress(self, chunk):
+        return self.compressor.process(chunk) + self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+    @staticmethod
+    def compress_all(data, level):
+        return brotli.compress(data, quality=min(level, 11))
+
+
+ENCODERS = {'gzip': GzipEncoder}
+if brotli is not None:
+    ENCODERS['br'] = BrotliEncoder
+
+
+def negotiate_encoding():
+    """
+    Return the content coding preferred by the request's Accept-Encoding
+    among the available ones, brotli first on equal quality, or None
+    """
+    return request.accept_encodings.best_match(
+        [each for each in ('br', 'gzip') if each in ENCODERS], default=None)
+
+
+def compressible(response, config):
+    return (200 <= response.status_code < 300 and response.status_code != 204
+            and not response.direct_passthrough
+            and 'Content-Encoding' not in response.headers
+            and response.mimetype in config['COMPRESSION_MIMETYPES'])
+
+
+def compress_response(response, config):
+    """
+    Compress the body of `response` with the coding negotiated with the
+    client, when its mimetype is in COMPRESSION_MIMETYPES.
+
+    Complete bodies smaller than COMPRESSION_MIN_SIZE bytes are sent as is.
+    Streamed bodies are compressed as they are sent, with a flush after
+    every chunk so clients can decode each row as soon as it arrives.
+    Strong ETags become weak, as the compressed bytes differ from the ones
+    they were computed for while the content is the same.
+    """
+    if response.status_code == 304 or response.mimetype in config['COMPRESSION_MIMETYPES']:
+        response.vary.add('Accept-Encoding')
+    if not compressible(response, config):
+        return response
+
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+    encoder, level = ENCODERS[encoding], config['COMPRESSION_LEVEL']
+
+    if response.is_streamed:
+        chunks = response.response
+        response.response = compress_stream(encoder(level), chunks, response)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESSION_MIN_SIZE']:
+            return response
+        response.set_data(encoder.compress_all(data, level))
+
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = unquote_etag(response.headers.get('ETag'))
+    if etag and not weak:
+        response.headers['ETag'] = quote_etag(etag, weak=True)
+    return response
+
+
+def compress_stream(encoder, chunks, response):
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode(response.charset)
+            compressed = encoder.compress(chunk)
+            if compressed:
+                yield compressed
+        yield encoder.finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def init_compression(app):
+    """ Compress the responses of the app as negotiated with each client """
+    app.after_request(lambda response: compress_response(response, app.config))
@@ -0,0 +1,71 @@
+"""Module for conditional GET requests."""
+
+# Third party Imports
+from datetime import datetime
+from functools import wraps
+from hashlib import sha1
+
+from flask import request, Response
+from flask_restplus.utils import unpack
+from werkzeug.http import http_date, quote_etag
+
+# Database
+from api.database import db
+
+
+def validators(versions):
+    """
+    Return the ETag digest and Last-Modified date of the current request, computed
+    in one statement from the `version_of` subqueries of the rows its
+    response is built from
+    """
+    row = db.session.query(*[column for version in versions for column in version.c]).one()
+
+    digest = sha1(repr((tuple(row), request.full_path, request.accept_mimetypes.to_header()))
+                  .encode()).hexdigest()
+    dates = [value for value in row if isinstance(value, datetime)]
+    return digest, max(dates) if dates else None
+
+
+def not_modified(etag, last_modified):
+    """ Whether the request validators match the current representation """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def conditional(versions, dated=True):
+    """
+    Serve a GET method conditionally on the validators of the rows it reads.
+
+    `versions` is called with the arguments of the method and returns the
+    `version_of` subqueries of those rows. Requests whose If-None-Match or
+    If-Modified-Since headers match get an empty 304 before any row is
+    loaded, other responses carry the ETag and Last-Modified headers.
+
+    Responses whose rows can be deleted without moving any date they are
+    read with are served `dated=False`, with the ETag only.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(resource, *args, **kwargs):
+            etag, last_modified = validators(versions(*args, **kwargs))
+            if not dated:
+                last_modified = None
+            headers = {'ETag': quote_etag(etag, weak=True)}
+            if last_modified:
+                headers['Last-Modified'] = http_date(last_modified)
+
+            if not_modified(etag, last_modified):
+                return Response(status=304, headers=headers)
+
+            response = method(resource, *args, **kwargs)
+            if isinstance(response, Response):
+                response.headers.extend(headers)
+                return response
+            data, code, extra = unpack(response)
+            return data, code, dict(extra or {}, **headers)
+        return wrapper
+    return decorator
@@ -1,6 +1,9 @@
 """Database setup module."""
+import sqlite3
+from contextlib import contextmanager
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import MetaData
+from sqlalchemy import MetaData, and_, or_, event
+from sqlalchemy.engine import Engine
 
 convention = {
     "ix": 'ix_%(column_0_label)s',
@@ -14,3 +17,60 @@ metadata = MetaData(naming_convention=convention)
 
 # Initialize database object
 db = SQLAlchemy(metadata=metadata)
+
+
+@event.listens_for(Engine, 'connect')
+def enforce_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """
+    Enforce foreign keys on SQLite connections as the other databases do,
+    writes rely on them to reject unknown references
+    """
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.execute('PRAGMA foreign_keys=ON')
+
+
+@contextmanager
+def unit_of_work():
+    """
+    Group the writes made inside the block into one transaction.
+
+    Model writes only flush while a unit of work is open. The outermost
+    block commits once on exit, or rolls everything back on error.
+    """
+    info = db.session.info
+    info['units_of_work'] = info.get('units_of_work', 0) + 1
+    try:
+        yield db.session
+        if info['units_of_work'] == 1:
+            db.session.commit()
+    except Exception:
+        if info['units_of_work'] == 1:
+            db.session.rollback()
+        raise
+    finally:
+        info['units_of_work'] -= 1
+
+
+def commit():
+    """
+    Commit the session, or only flush it inside a unit of work
+    """
+    if db.session.info.get('units_of_work'):
+        db.session.flush()
+    else:
+        db.session.commit()
+
+
+def keyset_after(columns, values):
+    """
+    Condition selecting the rows sorted after `values` on `columns`, written
+    as nested comparisons rather than a row value comparison so that every
+    database can read it as one range of an index on the columns
+    """
+    column, value = columns[0], values[0]
+    if len(columns) == 1:
+        return column > value
+    # the redundant leading bound lets the database seek the index to the cursor
+    return and_(
+        column >= value,
+        or_(column > value, and_(column == value, keyset_after(columns[1:], values[1:]))))
@@ -0,0 +1,263 @@
+"""Module for the Idempotency-Key support of the write endpoints."""
+
+# Third party Imports
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request, Response
+from flask_restplus.utils import unpack
+
+# Local Imports
+from api.messages import ERROR_MESSAGES
+from exception.validation import ValidationError
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+
+class IdempotencyStore(object):
+    """
+    Base class of the stores of the responses of idempotent requests.
+
+    A request with a new key reserves it for `IDEMPOTENCY_LOCK_TTL` seconds
+    while it runs, then stores its response for `IDEMPOTENCY_TTL` seconds.
+    Entries hold the fingerprint of the request, so a key reused for a
+    different request is told apart from a retry of the same one.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.ttl = app.config['IDEMPOTENCY_TTL']
+        self.lock_ttl = app.config['IDEMPOTENCY_LOCK_TTL']
+
+    def reserve(self, key, fingerprint):
+        """
+        Reserve `key` for the request of `fingerprint`
+
+        Returns:
+            dict: The entry already held under the key, None once reserved
+        """
+        entry = {'fingerprint': fingerprint, 'response': None}
+        while not self.add(key, entry, self.lock_ttl):
+            existing = self.get(key)
+            if existing is not None:
+                return existing
+        return None
+
+    def store(self, key, fingerprint, response):
+        self.set(key, {'fingerprint': fingerprint, 'response': response}, self.ttl)
+
+    def release(self, key):
+        """ Drop the reservation of a request that failed, so it can be retried """
+        self.delete(key)
+
+    def add(self, key, entry, ttl):
+        raise NotImplementedError(
+            "The add method must be overridden in all idempotency stores")  #noqa
+
+    def get(self, key):
+        raise NotImplementedError(
+            "The get method must be overridden in all idempotency stores")  #noqa
+
+    def set(self, key, entry, ttl):
+        raise NotImplementedError(
+            "The set method must be overridden in all idempotency stores")  #noqa
+
+    def delete(self, key):
+        raise NotImplementedError(
+            "The delete method must be overridden in all idempotency stores")  #noqa
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """
+    In-process store of at most `IDEMPOTENCY_SIZE` entries, the least
+    recently written dropped first. Each worker process has its own store,
+    so only retries reaching the same worker are replayed.
+    """
+
+    def __init__(self, app):
+        super(MemoryIdempotencyStore, self).__init__(app)
+        self.size = app.config['IDEMPOTENCY_SIZE']
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add(self, key, entry, ttl):
+        with self.lock:
+            if self._get(key) is not None:
+                return False
+            self._set(key, entry, ttl)
+            return True
+
+    def get(self, key):
+        with self.lock:
+            return self._get(key)
+
+    def set(self, key, entry, ttl):
+        with self.lock:
+            self._set(key, entry, ttl)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def _get(self, key):
+        expires, entry = self.entries.get(key, (None, None))
+        if entry is not None and expires <= time.monotonic():
+            del self.entries[key]
+            return None
+        return entry
+
+    def _set(self, key, entry, ttl):
+        self.entries[key] = (time.monotonic() + ttl, entry)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+
+class SharedIdempotencyStore(IdempotencyStore):
+    """
+    Store shared by every worker in a Redis compatible store at
+    `IDEMPOTENCY_URL`, so a retry is replayed whichever worker or Lambda
+    container it reaches. Entries expire from the store with their TTL.
+
+    Any client with `set` (with `nx` and `ex`), `get` and `delete` can be
+    given instead of one connected to `IDEMPOTENCY_URL`, which requires the
+    redis package.
+    """
+
+    prefix = 'favorite-things:idempotency:'
+
+    def __init__(self, app, client=None):
+        super(SharedIdempotencyStore, self).__init__(app)
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(app.config['IDEMPOTENCY_URL'])
+        self.client = client
+
+    def add(self, key, entry, ttl):
+        return bool(self.client.set(
+            self.prefix + key, json.dumps(entry), nx=True, ex=max(int(ttl), 1)))
+
+    def get(self, key):
+        entry = self.client.get(self.prefix + key)
+        return json.loads(entry) if entry is not None else None
+
+    def set(self, key, entry, ttl):
+        self.client.set(self.prefix + key, json.dumps(entry), ex=max(int(ttl), 1))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+IDEMPOTENCY_STORES = {
+    'memory': MemoryIdempotencyStore,
+    'shared': SharedIdempotencyStore,
+}
+
+
+def init_idempotency(app):
+    """ Attach the store of the configured IDEMPOTENCY_STORE to the app """
+    store = IDEMPOTENCY_STORES[app.config['IDEMPOTENCY_STORE']](app)
+    app.extensions['idempotency'] = store
+    return store
+
+
+def request_fingerprint():
+    """ Digest of the method, path, query string and body of the request """
+    digest = hashlib.sha256(f'{request.method} {request.full_path}\n'.encode())
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def idempotent(method):
+    """
+    Make a write method idempotent for the requests with an Idempotency-Key
+    header.
+
+    The first successful response of a key is stored and replayed, with an
+    `Idempotent-Replayed` header, for the retries of the same request
+    without running the method again. A key still in use by a running
+    request fails with 409, one reused for a different request with 422.
+    Failed requests are not stored, so they can be retried with their key.
+    Requests without the header run as usual.
+    """
+    @wraps(method)
+    def wrapper(resource, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return method(resource, *args, **kwargs)
+
+        max_length = current_app.config['IDEMPOTENCY_KEY_MAX_LENGTH']
+        if not key or len(key) > max_length:
+            raise ValidationError(
+                {
+                    'message': ERROR_MESSAGES['IDEMPOTENCY_KEY'].format(max_length)
+                }, 400)
+
+        store = current_app.extensions['idempotency']
+        fingerprint = request_fingerprint()
+        entry = store.reserve(key, fingerprint)
+        if entry is not None:
+            return replay(entry, fingerprint)
+
+        try:
+            response = method(resource, *args, **kwargs)
+        except BaseException:
+            store.release(key)
+            raise
+
+        stored = stored_response(response)
+        if stored is None:
+            store.release(key)
+        else:
+            store.store(key, fingerprint, stored)
+        return response
+    return wrapper
+
+
+def stored_response(response):
+    """ Storable form of a successful response, None for any other one """
+    if isinstance(response, Response):
+        if not 200 <= response.status_code < 300 or response.is_streamed:
+            return None
+        headers = {
+            name: value for name, value in response.headers.items()
+            if name not in ('Content-Length', 'Content-Type')
+        }
+        return {
+            'body': response.get_data(as_text=True),
+            'status': response.status_code,
+            'mimetype': response.mimetype,
+            'headers': headers,
+        }
+
+    data, code, headers = unpack(response)
+    if not 200 <= code < 300:
+        return None
+    return {'data': data, 'status': code, 'headers': dict(headers or {})}
+
+
+def replay(entry, fingerprint):
+    """ Response of the retry of the request stored in `entry` """
+    if entry['fingerprint'] != fingerprint:
+        raise ValidationError(
+            {
+                'message': ERROR_MESSAGES['IDEMPOTENCY_KEY_REUSED']
+            }, 422)
+    if entry['response'] is None:
+        raise ValidationError(
+            {
+                'message': ERROR_MESSAGES['IDEMPOTENCY_IN_PROGRESS']
+            }, 409)
+
+    stored = entry['response']
+    headers = dict(stored['headers'], **{REPLAYED_HEADER: 'true'})
+    if 'body' in stored:
+        return Response(
+            stored['body'], status=stored['status'], mimetype=stored['mimetype'],
+            headers=headers)
+    return stored['data'], stored['status'], headers
@@ -28,7 +28,14 @@ ERROR_MESSAGES = {
     'CHOICES_REQUIRED' : 'choices seperated by comma must be provided if multi choice inputs controls are selected',
     'BAD_DATA_ATTRIBUTE' : 'There is so problems with the data attributes, See errors',
     'DELETING_RELATED_OBJECTS' : "Can't remove a {} that has active {}",
-    'STRING_LENGTH' : 'Field must be {0} characters or more'
+    'STRING_LENGTH' : 'Field must be {0} characters or more',
+    'INCOMPLETE_ORDER' : 'Every favorite of the {} must be listed exactly once',
+    'UNKNOWN_FIELDS' : 'Unknown field(s) requested: {}',
+    'BULK_PAYLOAD' : 'Request body must be a list of 1 to {} items',
+    'BULK_IDS' : 'At most {} ids can be given at once',
+    'IDEMPOTENCY_KEY' : 'Idempotency-Key must be 1 to {} characters',
+    'IDEMPOTENCY_IN_PROGRESS' : 'A request with this Idempotency-Key is still in progress',
+    'IDEMPOTENCY_KEY_REUSED' : 'Idempotency-Key was already used for a different request'
 }
 
 
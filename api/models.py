@@ -1,13 +1,19 @@
 """Module for Company model."""
 
 # Database
-from sqlalchemy import text
-from api.database import db
+from contextlib import contextmanager
+from copy import deepcopy
+from flask import current_app
+from api.database import db, unit_of_work, commit, keyset_after
 from datetime import datetime as dt
 from sqlalchemy.dialects.mysql import JSON
+from sqlalchemy.exc import IntegrityError
 import re
 from exception.validation import ValidationError
 from .messages import ERROR_MESSAGES
+from .ranking import RANKING_ENGINES, ordinals, clamp
+from .audit_archive import AuditArchive
+from .response_cache import invalidate
 
 
 class BaseModel(db.Model):
@@ -19,31 +25,108 @@ class BaseModel(db.Model):
     created_date = db.Column(db.DateTime, default=dt.utcnow)
     modified_date = db.Column(db.DateTime, onupdate=dt.utcnow)
 
+    # error payload and status code raised in place of the IntegrityError
+    # of each constraint of the table, by constraint name
+    constraint_errors = {}
+
     def save(self):
         """
         Save a model instance
         """
         db.session.add(self)
-        db.session.commit()
+        commit()
+        invalidate(self.cache_tags())
         return self
 
     def update(self, **kwargs):
         """
-        update entries
+        update the entries that changed, nothing is written when the
+        instance has no changes
         """
-        for field, value in kwargs.items():
+        for field, value in self.changes(**kwargs).items():
             setattr(self, field, value)
 
-        db.session.commit()
+        if not db.session.is_modified(self):
+            return self
+        commit()
+        invalidate(self.cache_tags())
         return self
 
+    def changes(self, **kwargs):
+        """
+        Return the entries of `kwargs` whose values differ from the instance's
+        """
+        return {
+            field: value for field, value in kwargs.items()
+            if getattr(self, field) != value
+        }
+
+    def cache_tags(self):
+        """
+        Tags of the cached responses a write to the instance invalidates,
+        see `api.response_cache`
+        """
+        return ()
+
+    @classmethod
+    @contextmanager
+    def raising_constraint_errors(cls):
+        """
+        Raise the ValidationError of `constraint_errors` in place of the
+        IntegrityError of a violated constraint, writes then rely on the
+        database constraints instead of checking for conflicts beforehand
+        """
+        try:
+            yield
+        except IntegrityError as error:
+            constraint = cls.violated_constraint(error)
+            if constraint is None:
+                raise
+            if not db.session.info.get('units_of_work'):
+                db.session.rollback()
+            payload, status_code = cls.constraint_errors[constraint]
+            raise ValidationError(deepcopy(payload), status_code)
 
     @classmethod
-    def get(cls, id):
+    def violated_constraint(cls, error):
         """
-        return entries by id
+        Return the name of the constraint of `constraint_errors` violated by
+        an IntegrityError. MySQL and PostgreSQL name the constraint, SQLite
+        names the columns of unique constraints only.
         """
-        return cls.query.filter_by(id=id).first()
+        message = str(error.orig)
+        for constraint in cls.__table__.constraints:
+            if constraint.name not in cls.constraint_errors:
+                continue
+            columns = ', '.join(f'{cls.__tablename__}.{column.name}' for column in constraint.columns)
+            if constraint.name in message \
+                    or isinstance(constraint, db.UniqueConstraint) \
+                    and f'UNIQUE constraint failed: {columns}' in message \
+                    or isinstance(constraint, db.ForeignKeyConstraint) \
+                    and 'FOREIGN KEY constraint failed' in message:
+                return constraint.name
+        return None
+
+
+    @classmethod
+    def version_of(cls, query=None):
+        """
+        Return a one row subquery of the count, the highest id and the last
+        change date of the entries of `query`. Any insert, update or delete
+        of these entries changes at least one of them.
+        """
+        return (query or cls.query).with_entities(
+            db.func.count(cls.id).label('count'),
+            db.func.max(cls.id).label('last_id'),
+            db.func.max(db.func.coalesce(cls.modified_date, cls.created_date)).label('last_modified')
+        ).order_by(None).subquery()
+
+    @classmethod
+    def get(cls, id, query=None):
+        """
+        return entries by id, from `query` when given
+        """
+        return (query or cls.query).filter_by(id=id).first()
 
 
     @classmethod
@@ -55,12 +138,12 @@ class BaseModel(db.Model):
 
 
     @classmethod
-    def get_or_404(cls, id):
+    def get_or_404(cls, id, query=None):
         """
-        return entries by id
+        return entries by id, from `query` when given
         """
 
-        record = cls.get(id)
+        record = cls.get(id, query)
 
         if not record:
             raise ValidationError(
@@ -91,8 +174,9 @@ class BaseModel(db.Model):
         """
         Delete a model instance.
         """
+        invalidate(self.cache_tags())
         db.session.delete(self)
-        db.session.commit()
+        commit()
         return True
 
 class Category(BaseModel):
@@ -108,21 +192,92 @@ class Category(BaseModel):
         cascade='save-update, delete',
         lazy='dynamic')
 
+    constraint_errors = {
+        'uq_categories_name': ({'message': ERROR_MESSAGES['EXISTS'].format('Category')}, 409),
+    }
+
+    _favorites_count = None
+
     @property
     def favorites_count(self):
-        return self.favorites.count()
+        if self._favorites_count is None:
+            self._favorites_count = self.favorites.count()
+        return self._favorites_count
+
+    @classmethod
+    def with_favorites_count(cls, query=None, batch_size=None):
+        """
+        Yield the categories of `query` with their favorites count loaded
+        in the same statement, from a grouped count subquery joined in.
+        Rows are fetched `batch_size` at a time from a server side cursor
+        when a batch size is given.
+        """
+        counts = db.session.query(
+            Favorite.category_id, db.func.count(Favorite.id).label('count')
+        ).group_by(Favorite.category_id).subquery()
+
+        query = (query or cls.query).outerjoin(
+            counts, counts.c.category_id == cls.id
+        ).add_columns(db.func.coalesce(counts.c.count, 0)).order_by(cls.id)
+        if batch_size:
+            query = query.yield_per(batch_size)
+
+        for category, count in query:
+            category._favorites_count = count
+            yield category
 
     
     @property
     def rankings(self):
-        next_rank = self.favorites_count + 2
-        rankings = list(range(1, next_rank))
-        ordinal = lambda n: "%d%s" % (n,"tsnrhtdd"[(n/10%10!=1)*(n%10<4)*n%10::4])
-        return [dict(id=each, name=ordinal(each))for each in rankings]
+        return ordinals(self.favorites_count + 1)
 
     def get_child_relationships(self):
         return (self.favorites, )
 
+    @classmethod
+    def conflicts(cls, rows):
+        """
+        Return the errors, by index, of the rows of a bulk create whose name
+        is taken or repeated in the batch, found with a single IN query
+        """
+        names = {row['name'] for row in rows.values()}
+        taken = {name for name, in db.session.query(cls.name).filter(cls.name.in_(names))}
+
+        errors = {}
+        for index, row in rows.items():
+            if row['name'] in taken:
+                errors[index] = {'name': [ERROR_MESSAGES['EXISTS'].format('Category')]}
+            taken.add(row['name'])
+        return errors
+
+    @classmethod
+    def bulk_create(cls, rows):
+        """
+        Create many categories with one INSERT and one batch of audits
+
+        Args:
+            rows (list): Loaded categories, validated by `conflicts`
+
+        Returns:
+            list: Ids of the new categories, in the order of `rows`
+        """
+        names = [row['name'] for row in rows]
+        with cls.raising_constraint_errors(), unit_of_work():
+            db.session.execute(cls.__table__.insert(), [dict(name=name) for name in names])
+            created = {
+                row.name: row for row in db.session.execute(
+                    db.select([cls.id, cls.name]).where(cls.name.in_(names)))
+            }
+            created = [created[name] for name in names]
+
+            invalidate(['categories'] + [f'category:{row.id}' for row in created])
+            Audit.log_bulk(
+                'ADDED', created, 'category', lambda row: f'New category with name {row.name} was added')
+        return [row.id for row in created]
+
+    def cache_tags(self):
+        return ('categories', f'category:{self.id}')
+
     def __repr__(self):
         return f'<Category: {self.name}>'
 
@@ -130,18 +285,64 @@ class Category(BaseModel):
     def save(self):
         """
         """
-        instance = super(Category, self).save()
-        Audit.log_save(instance, 'category',  f'New category with name {instance.name} was added')
+        with self.raising_constraint_errors(), unit_of_work():
+            instance = super(Category, self).save()
+            Audit.log_save(instance, 'category',  f'New category with name {instance.name} was added')
         return instance
 
     def update(self, **kwargs):
         """
         """
-        instance = super(Category, self).update(**kwargs)
-        Audit.log_update(instance, 'category', f'Category with id {instance.id} was updated with new changes')
+        changes = self.changes(**kwargs)
+        if not changes:
+            return self
+
+        with self.raising_constraint_errors(), unit_of_work():
+            instance = super(Category, self).update(**changes)
+            # favorites are dumped with their category nested
+            invalidate(['favorites'])
+            Audit.log_update(
+                instance, 'category',
+                f'Category with id {instance.id} was updated with new changes to {", ".join(sorted(changes))}')
         return instance
 
 
+    def reorder_favorites(self, favorite_ids):
+        """
+        Rank the favorites of the category in the order of `favorite_ids`
+        with a single statement and a single audit entry. The order must
+        list every favorite of the category once the category lock is held.
+        """
+        engine = Favorite.ranking_engine()
+        with unit_of_work():
+            engine.lock(self.id)
+            current = db.session.execute(
+                db.select([Favorite.id]).where(Favorite.category_id == self.id).with_for_update())
+            if set(favorite_ids) != {row.id for row in current}:
+                raise ValidationError(
+                    {
+                        'errors': {
+                            'favoriteIds': [ERROR_MESSAGES['INCOMPLETE_ORDER'].format('category')]
+                        },
+                        'message': ERROR_MESSAGES['DEFAULT'],
+                    }, 400)
+            engine.reorder(self.id, favorite_ids)
+            invalidate(['favorites', f'category:{self.id}'])
+            Audit.log_update(self, 'category', f'Favorites of category with id {self.id} were reordered')
+        return self
+
+    @classmethod
+    def touch(cls, category_ids):
+        """
+        Mark the categories favorites were deleted or moved out of as
+        modified. Their Last-Modified dates would not change otherwise, as
+        no date of the rows left in the categories does.
+        """
+        db.session.execute(
+            cls.__table__.update()
+            .where(cls.id.in_(sorted(set(category_ids))))
+            .values(modified_date=dt.utcnow()))
+
     def delete(self):
         """ Delete a Category """
         
@@ -151,8 +352,9 @@ class Category(BaseModel):
                 'message': ERROR_MESSAGES['DELETING_RELATED_OBJECTS'].format('Category', 'Favorites'),
             }, 400)
             
-        status = super(Category, self).delete()
-        Audit.log_delete(self, 'category', f'Category with name {self.name} was removed')
+        with unit_of_work():
+            status = super(Category, self).delete()
+            Audit.log_delete(self, 'category', f'Category with name {self.name} was removed')
         return status
 
 
@@ -160,6 +362,11 @@ class Audit(BaseModel):
     """ Model for audit logs.
         Tracks all changes on different resources.
     """
+    __table_args__ = (
+        db.Index('ix_audit_resource_type_id', 'resource_type', 'id'),
+        db.Index('ix_audit_resource_type_resource_id_id', 'resource_type', 'resource_id', 'id'),
+    )
+
     resource_id = db.Column(db.Integer, index=True, nullable=False)
     resource_type = db.Column(db.String(60), index=True, nullable=False)
     action = db.Column(db.String(60), index=True, nullable=False)
@@ -176,6 +383,87 @@ class Audit(BaseModel):
     def __repr__(self):
         return f'<Audit on {self.resource_type}>'
 
+    @staticmethod
+    def archive():
+        """
+        return the archive of the audits moved out of the table
+        """
+        return AuditArchive(current_app.config['AUDIT_ARCHIVE_PATH'], Audit.__table__)
+
+    @classmethod
+    def version_of(cls, query=None):
+        """
+        Return a one row subquery of the lowest and highest audit ids of
+        `query`, read from the ends of the id indexes. Audits are only ever
+        added or archived oldest first, which moves one of the bounds.
+        """
+        return (query or cls.query).with_entities(
+            db.func.min(cls.id).label('first_id'),
+            db.func.max(cls.id).label('last_id')
+        ).order_by(None).subquery()
+
+    @classmethod
+    def ordered(cls, resource_type, cursor=None, **filters):
+        """
+        Return the query of the audits of a resource type, newest first,
+        after the `cursor` id and narrowed by the `page` filters
+        """
+        query = cls.filter(resource_type=resource_type)
+
+        if cursor is not None:
+            query = query.filter(cls.id < cursor)
+        for field in ('action', 'resource_id'):
+            if filters.get(field) is not None:
+                query = query.filter(getattr(cls, field) == filters[field])
+        if filters.get('created_from') is not None:
+            query = query.filter(cls.created_date >= filters['created_from'])
+        if filters.get('created_to') is not None:
+            query = query.filter(cls.created_date < filters['created_to'])
+
+        return query.order_by(cls.id.desc())
+
+    @classmethod
+    def page(cls, resource_type, cursor=None, limit=50, archived=False, **filters):
+        """
+        Return a page of the audits of a resource type, newest first, read
+        as one range of the resource type indexes.
+
+        Args:
+            resource_type (str): Type of the audited resources
+            cursor (int): Id of the last audit of the previous page
+            limit (int): Maximum number of audits in the page
+            archived (bool): Continue into the archive once the table is exhausted
+            filters: Optional action, resource_id, created_from and created_to
+
+        Returns:
+            tuple: The audits and the cursor of the next page, None on the last page
+        """
+        audits = cls.ordered(resource_type, cursor, **filters).limit(limit + 1).all()
+        if archived and len(audits) <= limit:
+            # archived audits are older, so their ids are below every stored one
+            before = audits[-1].id if audits else cursor
+            audits += [
+                cls(**row) for row in cls.archive().page(
+                    resource_type, before, limit + 1 - len(audits), **filters)
+            ]
+        next_cursor = audits[limit - 1].id if len(audits) > limit else None
+        return audits[:limit], next_cursor
+
+    @classmethod
+    def iterate(cls, resource_type, cursor=None, archived=False, batch_size=1000, **filters):
+        """
+        Yield the audits of a resource type, newest first, after the `cursor`
+        id and narrowed by the `page` filters, reading `batch_size` rows at a
+        time and continuing into the archive when `archived` is set
+        """
+        last_id = cursor
+        for audit in cls.ordered(resource_type, cursor, **filters).yield_per(batch_size):
+            last_id = audit.id
+            yield audit
+        if archived:
+            for row in cls.archive().rows(resource_type, last_id, **filters):
+                yield cls(**row)
+
 
     @staticmethod
     def log_save(instance, resource_type, activity):
@@ -189,6 +477,23 @@ class Audit(BaseModel):
     def log_delete(instance, resource_type, activity):
         return Audit.log('REMOVED', instance, resource_type, activity)
     
+    @classmethod
+    def log_bulk(cls, action, instances, resource_type, activity):
+        """
+        Log the same action on many instances as one batch of audits,
+        `activity` returns the activity of each instance
+        """
+        entries = [
+            {
+                'resource_id' : instance.id,
+                'resource_type' : resource_type.upper(),
+                'activity' : activity(instance),
+                'action': action
+            } for instance in instances
+        ]
+        audit_sink = current_app.extensions['audit_sink']
+        return audit_sink.write_many(entries)
+
     @classmethod
     def log(cls, *args):
         action, instance, resource_type, activity = args
@@ -198,8 +503,8 @@ class Audit(BaseModel):
             'activity' : activity,
             'action': action
         }
-        audit = cls(**params)
-        return audit.save()
+        audit_sink = current_app.extensions['audit_sink']
+        return audit_sink.write(params)
     
 
 
@@ -207,6 +512,9 @@ class Favorite(BaseModel):
     """Class for favorites db table."""
 
     __tablename__ = 'favorites'
+    __table_args__ = (
+        db.Index('ix_favorites_category_id_ranking_id', 'category_id', 'ranking', 'id'),
+    )
 
     title = db.Column(db.String(255), unique=True, nullable=False)
     description = db.Column(db.Text, nullable=True)
@@ -215,62 +523,288 @@ class Favorite(BaseModel):
         db.Integer, db.ForeignKey('categories.id'), nullable=False)
     meta_data = db.Column(JSON, nullable=True)
 
+    constraint_errors = {
+        'uq_favorites_title': ({'message': ERROR_MESSAGES['EXISTS'].format('Favorite')}, 409),
+        'favorites_category_id_fkey': ({
+            'message': ERROR_MESSAGES['DEFAULT'],
+            'errors': {'categoryId': [ERROR_MESSAGES['NOT_FOUND_IDENTIFIER'].format('category')]}
+        }, 400),
+    }
+
+    _position = None
 
 
     def __repr__(self):
         return f'<Favorite: {self.title}>'
 
     
+    @staticmethod
+    def ranking_engine():
+        """
+        return the ranking engine of the configured RANKING_MODE
+        """
+        return ranking_engines[current_app.config['RANKING_MODE']]
+
+    @property
+    def position(self):
+        """
+        Dense 1..n position of the favorite within its category
+        """
+        if self._position is None:
+            self._position = Favorite.ranking_engine().positions([self]).get(self.id)
+        return self._position
+
+    @classmethod
+    def with_fields(cls, query, fields=None, join_category=True):
+        """
+        Restrict the columns loaded by `query` to the ones of `fields`, plus
+        the ones always needed to paginate and rank favorites.
+
+        Args:
+            query (Query): Favorites to load
+            fields (list): Attributes to dump, None for all of them
+            join_category (bool): Join in the nested category when it is dumped
+        """
+        if join_category and (fields is None or 'category' in fields):
+            query = query.options(db.joinedload(cls.category))
+        if fields is None:
+            return query
+
+        columns = {'id', 'category_id', 'ranking'} | set(fields) & set(cls.__table__.columns.keys())
+        return query.options(db.load_only(*columns))
+
+    @classmethod
+    def ordered(cls, query, cursor=None, category_id=None):
+        """
+        Return `query` ordered by category and ranking, after the `cursor`
+        sort key, see `page`
+        """
+        columns = (cls.category_id, cls.ranking, cls.id)
+        if cursor is not None:
+            if category_id is not None:
+                query = query.filter(keyset_after(columns[1:], cursor[1:]))
+            else:
+                query = query.filter(keyset_after(columns, cursor))
+
+        return query.order_by(*columns)
+
+    @classmethod
+    def page(cls, query, cursor=None, limit=50, category_id=None):
+        """
+        Return a page of the favorites of `query` ordered by category and
+        ranking, read as one range of the (category_id, ranking, id) index.
+
+        Args:
+            query (Query): Favorites to paginate
+            cursor (tuple): Sort key of the last favorite of the previous page
+            limit (int): Maximum number of favorites in the page
+            category_id (int): Category `query` is restricted to, if any, the
+                cursor then seeks within the category on (ranking, id) only
+
+        Returns:
+            tuple: The favorites and the sort key of the next page, None on the last page
+        """
+        favorites = cls.ordered(query, cursor, category_id).limit(limit + 1).all()
+        next_cursor = None
+        if len(favorites) > limit:
+            last = favorites[limit - 1]
+            next_cursor = (last.category_id, last.ranking, last.id)
+        return favorites[:limit], next_cursor
+
+    def cache_tags(self):
+        return ('categories', 'favorites', f'category:{self.category_id}')
+
+    @classmethod
+    def conflicts(cls, rows):
+        """
+        Return the errors, by index, of the rows of a bulk create whose
+        category does not exist or whose title is taken or repeated in the
+        batch, found with a single IN query each
+        """
+        category_ids = {row['category_id'] for row in rows.values()}
+        existing = {pk for pk, in db.session.query(Category.id).filter(Category.id.in_(category_ids))}
+        titles = {row['title'] for row in rows.values()}
+        taken = {title for title, in db.session.query(cls.title).filter(cls.title.in_(titles))}
+
+        errors = {}
+        for index, row in rows.items():
+            if row['category_id'] not in existing:
+                errors.setdefault(index, {})['categoryId'] = [
+                    ERROR_MESSAGES['NOT_FOUND_IDENTIFIER'].format('category')]
+            if row['title'] in taken:
+                errors.setdefault(index, {})['title'] = [ERROR_MESSAGES['EXISTS'].format('Favorite')]
+            taken.add(row['title'])
+        return errors
+
+    @classmethod
+    def bulk_create(cls, rows):
+        """
+        Create many favorites with one INSERT, placed as if they were
+        created one after the other in the order of `rows`. The categories
+        touched are locked together and each one is reranked once, and the
+        audits are written as one batch.
+
+        Args:
+            rows (list): Loaded favorites, validated by `conflicts`
+
+        Returns:
+            list: Ids of the new favorites, in the order of `rows`
+        """
+        engine = cls.ranking_engine()
+        columns = ('title', 'description', 'ranking', 'meta_data', 'category_id')
+        titles = [row['title'] for row in rows]
+        category_ids = sorted({row['category_id'] for row in rows})
+
+        with cls.raising_constraint_errors(), unit_of_work():
+            engine.lock(*category_ids)
+            orders = {category_id: [] for category_id in category_ids}
+            for pk, category_id in db.session.execute(
+                    db.select([cls.id, cls.category_id])
+                    .where(cls.category_id.in_(category_ids))
+                    .order_by(cls.category_id, cls.ranking, cls.id)
+                    .with_for_update(read=True)):
+                orders[category_id].append(pk)
+
+            db.session.execute(
+                cls.__table__.insert(), [{column: row.get(column) for column in columns} for row in rows])
+            created = {
+                row.title: row for row in db.session.execute(
+                    db.select([cls.id, cls.title]).where(cls.title.in_(titles)))
+            }
+            created = [created[title] for title in titles]
+
+            for row, favorite in zip(rows, created):
+                order = orders[row['category_id']]
+                order.insert(clamp(row['ranking'], len(order)) - 1, favorite.id)
+            for category_id, order in orders.items():
+                engine.reorder(category_id, order)
+
+            invalidate(['categories', 'favorites'] + [f'category:{pk}' for pk in category_ids])
+            Audit.log_bulk(
+                'ADDED', created, 'favorite', lambda row: f'New favorite with title {row.title} was added')
+        return [row.id for row in created]
+
+    @classmethod
+    def bulk_delete(cls, ids):
+        """
+        Delete many favorites with one DELETE, closing the gaps they leave
+        with one rerank per category and writing the audits as one batch
+
+        Args:
+            ids (list): Ids of the favorites to delete
+
+        Returns:
+            list: Ids of the favorites not found, none are deleted then
+        """
+        engine = cls.ranking_engine()
+        query = db.select([cls.id, cls.title, cls.category_id]).where(cls.id.in_(ids))
+
+        with unit_of_work():
+            rows = db.session.execute(query).fetchall()
+            missing = sorted(set(ids) - {row.id for row in rows})
+            if missing:
+                return missing
+
+            category_ids = {row.category_id for row in rows}
+            engine.lock(*category_ids)
+            # the favorites may have been moved or deleted before the locks
+            # were held
+            rows = db.session.execute(query.with_for_update()).fetchall()
+            missing = sorted(set(ids) - {row.id for row in rows})
+            if missing:
+                return missing
+            moved = {row.category_id for row in rows} - category_ids
+            if moved:
+                engine.lock(*moved)
+                category_ids |= moved
+
+            db.session.execute(cls.__table__.delete().where(cls.id.in_(ids)))
+            engine.remove_many(category_ids)
+            Category.touch(category_ids)
+
+            invalidate(['categories', 'favorites'] + [f'category:{pk}' for pk in category_ids])
+            Audit.log_bulk(
+                'REMOVED', rows, 'favorite', lambda row: f'Favorite with title {row.title} was removed')
+        return []
+
+    @staticmethod
+    def load_positions(favorites):
+        """
+        Compute the positions of many favorites at once
+        """
+        positions = Favorite.ranking_engine().positions(favorites)
+        for favorite in favorites:
+            favorite._position = positions.get(favorite.id)
+
     def save(self):
         """
         """
-        instance = super(Favorite, self).save()
-        Favorite.reorder_ranks(instance.id, instance.category_id)
-        Audit.log_save(instance, 'favorite',  f'New favorite with title {instance.title} was added')
+        with self.raising_constraint_errors(), unit_of_work():
+            Favorite.ranking_engine().insert(self)
+            self._position = None
+            instance = super(Favorite, self).save()
+            Audit.log_save(instance, 'favorite',  f'New favorite with title {instance.title} was added')
         return instance
 
     def update(self, **kwargs):
         """
         """
-        instance = super(Favorite, self).update(**kwargs)
-        Favorite.reorder_ranks(instance.id, instance.category_id)
-        Audit.log_update(instance, 'favorite', f'Favorite with id {instance.id} was updated with new changes')
+        changes = self.changes(**kwargs)
+        if not changes:
+            return self
+
+        category_id, ranking = self.category_id, self.ranking
+        if 'category_id' in changes and 'ranking' not in changes:
+            # keeps its position, the sparse key is no position in the new category
+            self.ranking = self.position
+        for field, value in changes.items():
+            setattr(self, field, value)
+
+        with self.raising_constraint_errors(), unit_of_work():
+            if 'ranking' in changes or 'category_id' in changes:
+                Favorite.ranking_engine().move(self, category_id, ranking)
+                invalidate([f'category:{category_id}'])
+                self._position = None
+            if 'category_id' in changes:
+                Category.touch([category_id])
+            instance = super(Favorite, self).update()
+            Audit.log_update(
+                instance, 'favorite',
+                f'Favorite with id {instance.id} was updated with new changes to {", ".join(sorted(changes))}')
         return instance
 
+    def changes(self, **kwargs):
+        """
+        Return the entries of `kwargs` whose values differ from the favorite's.
+        Rankings are given as positions, which the sparse ranking mode does
+        not store, and always apply to a favorite moved to another category.
+        Within its category, a ranking past the last position is the last one.
+        """
+        ranking = kwargs.pop('ranking', None)
+        changes = super(Favorite, self).changes(**kwargs)
+        if ranking is None:
+            return changes
+
+        if 'category_id' not in changes:
+            ranking = Favorite.ranking_engine().bounded(self.id, self.category_id, ranking)
+            if ranking == self.position:
+                return changes
+        changes['ranking'] = ranking
+        return changes
+
     
     def delete(self):
         """
         """
-        status = super(Favorite, self).delete()
-        Favorite.reorder_ranks(None, self.category_id)
-        Audit.log_delete(self, 'favorite', f'Favorite with title {self.title} was removed')
+        with unit_of_work():
+            Favorite.ranking_engine().remove(self)
+            Category.touch([self.category_id])
+            status = super(Favorite, self).delete()
+            Audit.log_delete(self, 'favorite', f'Favorite with title {self.title} was removed')
         return status
 
-    @staticmethod
-    def reorder_ranks(pk, category_id):
-        query = \
-        """
-        UPDATE favorites f
-        JOIN (
-            SELECT t.id, count(*) AS rank_below
-            FROM favorites t
-            JOIN favorites tr ON tr.ranking <= t.ranking
-            WHERE tr.category_id = {0}
-            GROUP BY t.id
-        ) c ON c.id=f.id
-        SET f.ranking = c.rank_below
-        """
-        if pk:
-            query += \
-                """
-                WHERE (f.id < {1} or f.id > {1})
-                AND f.category_id = {0}
-                """
-            query = query.format(category_id,pk)
-        else:
-            query += \
-                """
-                WHERE f.category_id = {0}
-                """
-            query = query.format(category_id)
-        output = db.engine.execute(text(query))
+
+ranking_engines = {
+    mode: engine(Favorite.__table__, Category.__table__)
+    for mode, engine in RANKING_ENGINES.items()
+}
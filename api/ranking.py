@@ -0,0 +1,478 @@
+"""Module for the favorites ranking engines."""
+
+# Third party Imports
+import threading
+
+# Database
+from sqlalchemy import and_, or_, func, select, case, bindparam, text
+from sqlalchemy.orm.attributes import flag_modified
+from api.database import db
+
+
+def clamp(ranking, count):
+    """ Return `ranking` within the 1..count+1 positions next to `count` favorites """
+    return min(max(ranking, 1), count + 1)
+
+
+class RankingEngine(object):
+    """
+    Base class of the engines maintaining favorite rankings.
+
+    The hooks run inside the session transaction of the favorite write:
+    `insert` before a new favorite is added, `move` after the new values of
+    a favorite have been assigned and `remove` before it is deleted.
+
+    Every rank mutation first locks the rows of the categories it touches,
+    so writers of the same category are serialized until commit while
+    writers of other categories never wait on each other.
+    """
+
+    step = 1
+    batch_size = 1000
+
+    def __init__(self, table, categories):
+        self.table = table
+        self.categories = categories
+        self._statements = {}
+
+    def insert(self, favorite):
+        self.lock(favorite.category_id)
+        self._insert(favorite)
+
+    def move(self, favorite, category_id, ranking):
+        self.lock(category_id, favorite.category_id)
+        category_id, ranking = self._stored(favorite, category_id) or (category_id, ranking)
+        self._move(favorite, category_id, ranking)
+        # the new ranking may equal the one loaded before the lock while the
+        # stored one differs, it must be written along with the shifts
+        flag_modified(favorite, 'ranking')
+
+    def remove(self, favorite):
+        self.lock(favorite.category_id)
+        stored = self._stored(favorite)
+        if stored is None:
+            # already deleted by another writer, which closed its gap
+            return
+        self._remove(favorite, *stored)
+
+    def remove_many(self, category_ids):
+        """
+        Close the gaps left by favorites deleted together, after their rows
+        are deleted, with one rebalance per category
+        """
+        for category_id in sorted(category_ids):
+            self.rebalance(category_id)
+
+    def lock(self, *category_ids):
+        """
+        Lock the rows of the given categories for the rest of the
+        transaction. The rows are locked by one statement in id order so
+        that writers spanning two categories cannot deadlock.
+        """
+        db.session.execute(self.lock_statement(category_ids, db.engine.name))
+
+    def lock_statement(self, category_ids, dialect_name):
+        ids = sorted(set(category_ids))
+        if dialect_name == 'sqlite':
+            # SQLite has no row locks, a no-op write takes its database lock
+            return self.categories.update() \
+                .where(self.categories.c.id.in_(ids)) \
+                .values(id=self.categories.c.id, modified_date=self.categories.c.modified_date)
+
+        return select([self.categories.c.id]) \
+            .where(self.categories.c.id.in_(ids)) \
+            .order_by(self.categories.c.id) \
+            .with_for_update()
+
+    def bounded(self, pk, category_id, ranking, locked=False):
+        """
+        Return `ranking` within the 1..n+1 positions a favorite can take
+        among the n other favorites of a category. Once the category lock is
+        held, the favorites are counted with a locking read, which sees the
+        latest committed ones instead of the snapshot taken before the lock.
+        """
+        conditions = [self.table.c.category_id == category_id]
+        if pk is not None:
+            conditions.append(self.table.c.id != pk)
+        if locked:
+            # aggregates cannot be read with FOR SHARE on PostgreSQL
+            ids = db.session.execute(
+                select([self.table.c.id]).where(and_(*conditions)).with_for_update(read=True))
+            return clamp(ranking, len(ids.fetchall()))
+
+        count = db.session.execute(
+            select([func.count()]).select_from(self.table).where(and_(*conditions))).scalar()
+        return clamp(ranking, count)
+
+    def _stored(self, favorite, *locked):
+        """
+        Return the category and ranking of a favorite as stored once the
+        category lock is held, the values loaded with the favorite may
+        predate a concurrent mutation. Returns None once it is deleted.
+        """
+        stored = db.session.execute(
+            select([self.table.c.category_id, self.table.c.ranking])
+            .where(self.table.c.id == favorite.id)
+            .with_for_update()).first()
+        if stored is None:
+            return None
+
+        if stored.category_id not in (favorite.category_id,) + locked:
+            self.lock(stored.category_id)
+        return stored.category_id, stored.ranking
+
+    def _insert(self, favorite):
+        raise NotImplementedError(
+            "The _insert method must be overridden in all ranking engines")  #noqa
+
+    def _move(self, favorite, category_id, ranking):
+        raise NotImplementedError(
+            "The _move method must be overridden in all ranking engines")  #noqa
+
+    def _remove(self, favorite, category_id, ranking):
+        raise NotImplementedError(
+            "The _remove method must be overridden in all ranking engines")  #noqa
+
+    def positions(self, favorites):
+        """
+        Return a dict mapping the id of each favorite to its dense 1..n
+        position within its category.
+        """
+        raise NotImplementedError(
+            "The positions method must be overridden in all ranking engines")  #noqa
+
+    def rebalance(self, category_id):
+        """
+        Rewrite the stored rankings of a category from its current order,
+        with a single ROW_NUMBER() statement where the database allows it.
+        """
+        self.lock(category_id)
+        statement = self.rerank_statement(db.engine.dialect)
+        if statement is None:
+            return self.rebalance_portable(category_id)
+
+        db.session.connection().execute(statement, category_id=category_id, step=self.step)
+
+    def rebalance_portable(self, category_id):
+        """
+        Rebalance a category by reading its order and writing it back
+        through `reorder`, for databases without window functions.
+        """
+        self.lock(category_id)
+        ids = db.session.execute(
+            select([self.table.c.id])
+            .where(self.table.c.category_id == category_id)
+            .order_by(self.table.c.ranking, self.table.c.id)
+            .with_for_update(read=True)).fetchall()
+
+        self.reorder(category_id, [row.id for row in ids])
+
+    def rerank_statement(self, dialect):
+        """
+        Return the native rerank statement of a dialect compiled once, or
+        None when the server is too old to run it.
+        """
+        if dialect.name not in RERANK_STATEMENTS:
+            return None
+
+        version, query = RERANK_STATEMENTS[dialect.name]
+        if not self.supports(dialect, version):
+            return None
+        return self._compiled(('rerank',), lambda: text(query), dialect)
+
+    def window_functions(self, dialect):
+        """ Return whether the server of a dialect can run ROW_NUMBER() """
+        return dialect.name in WINDOW_FUNCTIONS and \
+            self.supports(dialect, WINDOW_FUNCTIONS[dialect.name])
+
+    @staticmethod
+    def supports(dialect, version):
+        """ Return whether the server of a dialect is at least `version` """
+        info = dialect.server_version_info
+        return not info or tuple(info[:2]) >= version
+
+    def _compiled(self, key, build, dialect=None):
+        """ Compile the statement made by `build` once per dialect """
+        dialect = dialect or db.engine.dialect
+        key = key + (dialect.name,)
+        if key not in self._statements:
+            self._statements[key] = build().compile(dialect=dialect)
+        return self._statements[key]
+
+    def reorder(self, category_id, ids):
+        """
+        Store a complete order of the favorites of a category in a single
+        UPDATE statement per `batch_size` favorites.
+        """
+        if not ids:
+            return
+
+        self.lock(category_id)
+        for start in range(0, len(ids), self.batch_size):
+            keys = {
+                pk: self.key_at(position)
+                for position, pk in enumerate(ids[start:start + self.batch_size], start=start + 1)
+            }
+            statement = self.table.update() \
+                .where(and_(self.table.c.category_id == category_id, self.table.c.id.in_(keys))) \
+                .values(ranking=case(keys, value=self.table.c.id))
+            db.session.execute(statement)
+
+    def key_at(self, position):
+        """ Return the stored ranking of the favorite at `position` after a rebalance """
+        return position * self.step
+
+
+class DenseRankingEngine(RankingEngine):
+    """
+    Stores the 1..n position of each favorite in its ranking column.
+
+    Each mutation only shifts the rows lying between the old and the new
+    position of a favorite, so the cost of a save, update or delete grows
+    with the size of the affected range instead of the whole category.
+    """
+
+    def _insert(self, favorite):
+        """
+        Make room for a favorite by moving every favorite at or below its
+        position one step down, past the last one at most.
+        """
+        favorite.ranking = self.bounded(None, favorite.category_id, favorite.ranking, locked=True)
+        self._shift(None, favorite.category_id, 1, lower=favorite.ranking)
+
+    def _move(self, favorite, category_id, ranking):
+        """
+        Shift the favorites between the old and the new position of a
+        favorite, closing its old slot when it changed category.
+        """
+        favorite.ranking = self.bounded(
+            favorite.id, favorite.category_id, favorite.ranking, locked=True)
+        pk, new_ranking = favorite.id, favorite.ranking
+
+        if favorite.category_id != category_id:
+            self._shift(pk, category_id, -1, lower=ranking + 1)
+            self._shift(pk, favorite.category_id, 1, lower=new_ranking)
+        elif new_ranking < ranking:
+            self._shift(pk, category_id, 1, lower=new_ranking, upper=ranking - 1)
+        elif new_ranking > ranking:
+            self._shift(pk, category_id, -1, lower=ranking + 1, upper=new_ranking)
+
+    def _remove(self, favorite, category_id, ranking):
+        """
+        Close the gap left by a deleted favorite by moving every favorite
+        below it one step up.
+        """
+        self._shift(favorite.id, category_id, -1, lower=ranking + 1)
+
+    def positions(self, favorites):
+        return {favorite.id: favorite.ranking for favorite in favorites}
+
+    def _shift(self, pk, category_id, step, lower, upper=None):
+        """ Add `step` to the rankings within [lower, upper] of a category """
+        def build():
+            column = self.table.c.ranking
+            conditions = [
+                self.table.c.category_id == bindparam('category_id'),
+                column >= bindparam('lower'),
+            ]
+            if upper is not None:
+                conditions.append(column <= bindparam('upper'))
+            if pk is not None:
+                conditions.append(self.table.c.id != bindparam('pk'))
+
+            return self.table.update() \
+                .where(and_(*conditions)) \
+                .values(ranking=column + bindparam('step'))
+
+        statement = self._compiled(('shift', upper is None, pk is None), build)
+        db.session.connection().execute(
+            statement, pk=pk, category_id=category_id, step=step, lower=lower, upper=upper)
+
+
+class SparseRankingEngine(RankingEngine):
+    """
+    Stores sparse sort keys in the ranking column.
+
+    Placing a favorite picks a key between its new neighbours so only that
+    row is written. The dense position is computed at read time, and a
+    category is rebalanced to evenly spaced keys once two neighbours run
+    out of room between them.
+    """
+
+    step = 1024
+
+    def _insert(self, favorite):
+        """ Replace the requested position of a new favorite with a key """
+        favorite.ranking = self._key_for(None, favorite.category_id, favorite.ranking)
+
+    def _move(self, favorite, category_id, ranking):
+        """ Replace the requested position of a moved favorite with a key """
+        favorite.ranking = self._key_for(favorite.id, favorite.category_id, favorite.ranking)
+
+    def _remove(self, favorite, category_id, ranking):
+        """ Removing a favorite leaves the keys of its neighbours untouched """
+
+    def remove_many(self, category_ids):
+        """ Removing favorites leaves the keys of their neighbours untouched """
+
+    def positions(self, favorites):
+        """
+        Number the favorites of the categories of `favorites` with a single
+        ROW_NUMBER() subquery, keeping the rows of the requested ids.
+        """
+        ids = [favorite.id for favorite in favorites]
+        if not ids:
+            return {}
+        if not self.window_functions(db.engine.dialect):
+            return self.positions_portable(ids)
+
+        def build():
+            requested = bindparam('ids', expanding=True)
+            position = func.row_number().over(
+                partition_by=self.table.c.category_id,
+                order_by=(self.table.c.ranking, self.table.c.id))
+            ranked = select([self.table.c.id, position.label('position')]) \
+                .where(self.table.c.category_id.in_(
+                    select([self.table.c.category_id]).where(self.table.c.id.in_(requested)))) \
+                .alias('ranked')
+            return select([ranked.c.id, ranked.c.position]).where(ranked.c.id.in_(requested))
+
+        statement = self._compiled(('positions',), build)
+        return dict(db.session.connection().execute(statement, ids=ids).fetchall())
+
+    def positions_portable(self, ids):
+        """
+        Count the favorites ranked up to each requested one, for databases
+        without window functions.
+        """
+        other = self.table.alias()
+        ahead = or_(
+            other.c.ranking < self.table.c.ranking,
+            and_(other.c.ranking == self.table.c.ranking, other.c.id <= self.table.c.id))
+        query = select([self.table.c.id, func.count(other.c.id)]) \
+            .select_from(self.table.join(
+                other, and_(other.c.category_id == self.table.c.category_id, ahead))) \
+            .where(self.table.c.id.in_(ids)) \
+            .group_by(self.table.c.id)
+
+        return dict(db.session.execute(query).fetchall())
+
+    def _key_for(self, pk, category_id, position):
+        """
+        Return a key placing a favorite at `position` among the other
+        favorites of a category, rebalancing the category when its
+        neighbours have no room left between them.
+        """
+        low, high = self._neighbours(pk, category_id, position)
+
+        if low is not None and high is not None and high - low < 2:
+            self.rebalance(category_id)
+            low, high = self._neighbours(pk, category_id, position)
+
+        if low is None and high is None:
+            return self.step
+        if low is None:
+            return high - self.step
+        if high is None:
+            return low + self.step
+        return (low + high) // 2
+
+    def _neighbours(self, pk, category_id, position):
+        """ Return the keys ranked just above and at `position` in a category """
+        column = self.table.c.ranking
+        conditions = [self.table.c.category_id == category_id]
+        if pk is not None:
+            conditions.append(self.table.c.id != pk)
+        # locking reads see the latest committed keys instead of the
+        # snapshot taken before the category lock was acquired
+        query = select([column]).where(and_(*conditions)).with_for_update(read=True)
+
+        if position <= 1:
+            first = db.session.execute(query.order_by(column).limit(1)).scalar()
+            return None, first
+
+        keys = [
+            row.ranking for row in db.session.execute(
+                query.order_by(column, self.table.c.id).offset(position - 2).limit(2))
+        ]
+        if not keys:
+            last = db.session.execute(query.order_by(column.desc()).limit(1)).scalar()
+            return last, None
+
+        keys.append(None)
+        return keys[0], keys[1]
+
+
+class OrdinalTable(object):
+    """
+    Shared table of the `{id, name}` ordinal labels offered as ranking
+    choices, e.g `{'id': 2, 'name': '2nd'}`. Labels are built once, the
+    first time a category needs them, and reused by every category.
+    """
+
+    def __init__(self):
+        self.labels = []
+        self.lock = threading.Lock()
+
+    def __call__(self, count):
+        """ Return the labels of the rankings 1 to `count` """
+        if len(self.labels) < count:
+            with self.lock:
+                self.labels.extend(
+                    dict(id=each, name=self.ordinal(each))
+                    for each in range(len(self.labels) + 1, count + 1))
+        return self.labels[:count]
+
+    @staticmethod
+    def ordinal(n):
+        return "%d%s" % (n, "tsnrhtdd"[(n // 10 % 10 != 1) * (n % 10 < 4) * n % 10::4])
+
+
+ordinals = OrdinalTable()
+
+
+# Reranks numbering a category with ROW_NUMBER() in one statement, with the
+# minimum server version of each dialect able to run them. Only the rows
+# whose ranking changes are written.
+RERANK_STATEMENTS = {
+    'postgresql': ((8, 4), """
+        UPDATE favorites f SET ranking = r.position * :step
+        FROM (
+            SELECT id, ROW_NUMBER() OVER (ORDER BY ranking, id) AS position
+            FROM favorites WHERE category_id = :category_id
+        ) r
+        WHERE f.id = r.id AND f.ranking <> r.position * :step
+    """),
+    'mysql': ((8, 0), """
+        UPDATE favorites f
+        JOIN (
+            SELECT id, ROW_NUMBER() OVER (ORDER BY ranking, id) AS position
+            FROM favorites WHERE category_id = :category_id
+        ) r ON r.id = f.id
+        SET f.ranking = r.position * :step
+        WHERE f.ranking <> r.position * :step
+    """),
+    'sqlite': ((3, 33), """
+        UPDATE favorites SET ranking = r.position * :step
+        FROM (
+            SELECT id, ROW_NUMBER() OVER (ORDER BY ranking, id) AS position
+            FROM favorites WHERE category_id = :category_id
+        ) AS r
+        WHERE favorites.id = r.id AND favorites.ranking <> r.position * :step
+    """),
+}
+
+
+# Minimum server version of each dialect able to run ROW_NUMBER() in a SELECT,
+# below the UPDATE ... FROM of the rerank statements on SQLite.
+WINDOW_FUNCTIONS = {
+    'postgresql': (8, 4),
+    'mysql': (8, 0),
+    'sqlite': (3, 25),
+}
+
+
+RANKING_ENGINES = {
+    'dense': DenseRankingEngine,
+    'sparse': SparseRankingEngine,
+}
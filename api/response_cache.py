@@ -0,0 +1,236 @@
+"""Module for the read-through cache of GET responses."""
+
+# Third party Imports
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request, Response
+from flask_restplus.utils import unpack
+from sqlalchemy import event
+from werkzeug.http import parse_date, unquote_etag
+
+# Database
+from api.database import db
+from api.conditional import not_modified
+
+
+class ResponseCache(object):
+    """
+    Base class of the response caches.
+
+    Responses are cached under their path, query string and Accept header,
+    along with the generation of each tag they were built from, e.g
+    `category:1` for the favorites of category 1. Model writes invalidate
+    their tags once their transaction commits by moving the tags on to a
+    new generation, which turns every response cached under an older one
+    into a miss. Generations are read before the response is built, so a
+    response racing a write is cached under the generation it has seen.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.ttl = app.config['RESPONSE_CACHE_TTL']
+        self.hits = 0
+        self.misses = 0
+        self.counters = threading.Lock()
+
+        event.listen(db.session, 'after_commit', self.after_commit)
+        event.listen(db.session, 'after_soft_rollback', self.after_rollback)
+
+    def lookup(self, key, tags):
+        """
+        Return the response cached under `key` if its tags are still current,
+        and the current generations of `tags`
+        """
+        entry, generations = self.read(key, tags)
+        hit = entry is not None and entry['generations'] == generations
+        with self.counters:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return (entry['response'] if hit else None), generations
+
+    def store(self, key, generations, response):
+        self.write(key, {'generations': generations, 'response': response})
+
+    def invalidate(self, tags):
+        """ Invalidate `tags` once the current transaction commits """
+        db.session.info.setdefault('cache_tags', {}).setdefault(self, set()).update(tags)
+
+    def after_commit(self, session):
+        tags = session.info.get('cache_tags', {}).pop(self, None)
+        if tags:
+            self.bump(sorted(tags))
+
+    def after_rollback(self, session, previous_transaction):
+        session.info.get('cache_tags', {}).pop(self, None)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def read(self, key, tags):
+        raise NotImplementedError(
+            "The read method must be overridden in all response caches")  #noqa
+
+    def write(self, key, entry):
+        raise NotImplementedError(
+            "The write method must be overridden in all response caches")  #noqa
+
+    def bump(self, tags):
+        raise NotImplementedError(
+            "The bump method must be overridden in all response caches")  #noqa
+
+    def close(self):
+        event.remove(db.session, 'after_commit', self.after_commit)
+        event.remove(db.session, 'after_soft_rollback', self.after_rollback)
+
+
+class MemoryResponseCache(ResponseCache):
+    """
+    In-process LRU cache of at most `RESPONSE_CACHE_SIZE` responses kept for
+    `RESPONSE_CACHE_TTL` seconds. Each worker process has its own cache and
+    only sees the writes it commits itself, so with several workers a
+    response may be served for up to the TTL after another one changed it.
+    """
+
+    def __init__(self, app):
+        super(MemoryResponseCache, self).__init__(app)
+        self.size = app.config['RESPONSE_CACHE_SIZE']
+        self.entries = OrderedDict()
+        self.generations = {}
+        self.lock = threading.Lock()
+
+    def read(self, key, tags):
+        with self.lock:
+            generations = {tag: self.generations.get(tag, 0) for tag in tags}
+            expires, entry = self.entries.get(key, (None, None))
+            if entry is None:
+                return None, generations
+            if expires <= time.monotonic() or entry['generations'] != generations:
+                del self.entries[key]
+                return None, generations
+            self.entries.move_to_end(key)
+            return entry, generations
+
+    def write(self, key, entry):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, entry)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def bump(self, tags):
+        with self.lock:
+            for tag in tags:
+                self.generations[tag] = self.generations.get(tag, 0) + 1
+
+
+class SharedResponseCache(ResponseCache):
+    """
+    Cache shared by every worker in a Redis compatible store at
+    `RESPONSE_CACHE_URL`, so a write committed by one worker invalidates the
+    responses cached by all of them. Entries expire from the store after
+    `RESPONSE_CACHE_TTL` seconds, an entry and the generations of its tags
+    are read in one round trip.
+
+    Any client with `mget`, `set` and `incr` can be given instead of one
+    connected to `RESPONSE_CACHE_URL`, which requires the redis package.
+    """
+
+    prefix = 'favorite-things:response:'
+
+    def __init__(self, app, client=None):
+        super(SharedResponseCache, self).__init__(app)
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(app.config['RESPONSE_CACHE_URL'])
+        self.client = client
+
+    def read(self, key, tags):
+        entry, *generations = self.client.mget(
+            [self.prefix + key] + [self.tag_key(tag) for tag in tags])
+        generations = {tag: int(value or 0) for tag, value in zip(tags, generations)}
+        return (json.loads(entry) if entry is not None else None), generations
+
+    def write(self, key, entry):
+        self.client.set(self.prefix + key, json.dumps(entry), ex=max(int(self.ttl), 1))
+
+    def bump(self, tags):
+        for tag in tags:
+            self.client.incr(self.tag_key(tag))
+
+    def tag_key(self, tag):
+        return f'{self.prefix}tag:{tag}'
+
+
+class NullResponseCache(ResponseCache):
+    """ Caches nothing, every lookup is a miss """
+
+    def read(self, key, tags):
+        return None, {}
+
+    def write(self, key, entry):
+        pass
+
+    def invalidate(self, tags):
+        pass
+
+    def bump(self, tags):
+        pass
+
+
+RESPONSE_CACHES = {
+    'none': NullResponseCache,
+    'memory': MemoryResponseCache,
+    'shared': SharedResponseCache,
+}
+
+
+def init_response_cache(app):
+    """ Attach the response cache of the configured RESPONSE_CACHE to the app """
+    cache = RESPONSE_CACHES[app.config['RESPONSE_CACHE']](app)
+    app.extensions['response_cache'] = cache
+    return cache
+
+
+def invalidate(tags):
+    """ Invalidate the responses cached under `tags` once the transaction commits """
+    current_app.extensions['response_cache'].invalidate(tags)
+
+
+def cached(tags):
+    """
+    Serve a GET method from the response cache.
+
+    `tags` is called with the arguments of the method and returns the tags
+    invalidated by the writes its response depends on. Only complete 200
+    responses are cached, NDJSON streams and 304s pass through. A cached
+    response still answers a matching If-None-Match with an empty 304.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(resource, *args, **kwargs):
+            cache = current_app.extensions['response_cache']
+            key = f'{request.full_path} {request.accept_mimetypes.to_header()}'
+            response, generations = cache.lookup(key, tags(*args, **kwargs))
+
+            if response is not None:
+                data, code, headers = response
+                etag, weak = unquote_etag(headers.get('ETag'))
+                if etag and not_modified(etag, parse_date(headers.get('Last-Modified'))):
+                    return Response(status=304, headers=headers)
+                return data, code, headers
+
+            response = method(resource, *args, **kwargs)
+            if isinstance(response, Response):
+                return response
+            data, code, headers = unpack(response)
+            if code == 200:
+                cache.store(key, generations, [data, code, dict(headers or {})])
+            return data, code, headers
+        return wrapper
+    return decorator
@@ -1,14 +1,19 @@
 """ Module with user model schemas. """
 
 # Third Party
-from marshmallow import (Schema, fields, post_load)
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import timezone
+
+from marshmallow import (Schema, fields, post_load, pre_dump, validates)
+from marshmallow.validate import Length, Range
 from marshmallow import ValidationError as MarshValidationError
 
 from exception.validation import ValidationError
 
 from .messages import ERROR_MESSAGES
 
-from api.models import Category, Favorite
+from api.models import Favorite
 
 
 class BaseSchema(Schema):
@@ -29,6 +34,26 @@ class BaseSchema(Schema):
 
         return data
 
+    def load_items_into_schema(self, items):
+        """
+        Helper function to load the items of a bulk payload
+
+        Returns:
+            tuple: The loaded items and the errors of the invalid ones, by index
+        """
+        loaded, errors = {}, {}
+        for index, item in enumerate(items):
+            try:
+                data, item_errors = self.load(item)
+            except ValidationError as error:
+                data, item_errors = None, {'_schema': [error.error['message']]}
+
+            if item_errors:
+                errors[index] = item_errors
+            else:
+                loaded[index] = data
+        return loaded, errors
+
     @staticmethod
     def raise_errors(errors):
         if errors:
@@ -56,22 +81,35 @@ def common_args(**kwargs):
     }
 
 
-def validate_duplicate(model, error_key, obj, **kwargs):
-    validate(model, error_key, obj, 409, **kwargs)
+def encode_cursor(values):
+    """ Returns the opaque pagination cursor of a sort key """
+    return urlsafe_b64encode(json.dumps(list(values)).encode()).decode().rstrip('=')
+
+
+class CursorField(fields.Field):
+    """ Opaque keyset pagination cursor wrapping the sort key of the last row of a page """
+
+    default_error_messages = {
+        'invalid': 'Not a valid cursor.'
+    }
+
+    def __init__(self, size, **kwargs):
+        super(CursorField, self).__init__(**kwargs)
+        self.size = size
 
+    def _serialize(self, value, attr, obj):
+        return None if value is None else encode_cursor(value)
 
-def validate_category_exist(value):
-    category = Category.get(value)
-    raise_error('NOT_FOUND_IDENTIFIER', 'category', fields=['categoryId']) if not category else None
+    def _deserialize(self, value, attr, data):
+        try:
+            values = json.loads(urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode())
+        except (TypeError, ValueError):
+            self.fail('invalid')
+        if not isinstance(values, list) or len(values) != self.size or \
+                not all(isinstance(each, int) for each in values):
+            self.fail('invalid')
+        return tuple(values)
 
-def validate(model, *args, **kwargs):
-    error_key, obj, status_code = args
-    instance = model.filter(**kwargs).first()
-    if instance:
-        raise ValidationError(
-        {
-            'message': ERROR_MESSAGES[error_key].format(obj)
-        }, status_code)
 
 def raise_error(error_key, *args, **kwargs):
     """Raises a Marshmallow validation error
@@ -94,6 +132,15 @@ def description_validator(value):
     if value and len(value) < 10:
         raise_error('STRING_LENGTH', 10, fields=value)
 
+class RankingField(fields.Integer):
+    """Integer field dumping the dense position of a favorite,
+    whatever ranking mode stores it"""
+
+    def _serialize(self, value, attr, obj):
+        return super(RankingField, self)._serialize(
+            getattr(obj, 'position', value), attr, obj)
+
+
 class CategorySchema(BaseSchema):
     """ Category model schema. """
 
@@ -105,11 +152,19 @@ class CategorySchema(BaseSchema):
 
     rankings = fields.Dict(dump_to='rankings', dump_only=True)
 
+    # fields only dumped when named in the `include` argument
+    optional_fields = ('rankings',)
+
+    def __init__(self, *args, include=(), **kwargs):
+        kwargs['exclude'] = tuple(
+            set(kwargs.get('exclude', ())) | (set(self.optional_fields) - set(include)))
+        super(CategorySchema, self).__init__(*args, **kwargs)
+
     @post_load
     def is_valid(self, data):
         """
-        Ensure id fields reference existing resource
-        and name supplied is not owned by an exising category
+        Ensure a name is supplied, names owned by another category are
+        rejected by their unique constraint when the category is saved
 
         Arguments:
             data (dict): request body
@@ -122,12 +177,6 @@ class CategorySchema(BaseSchema):
             {
                 'message': ERROR_MESSAGES['NOT_FOUND'].format('Name')
             }, 400)
-        if data.get('id'):
-            category = Category.get(data.get('id'))
-            if category.name == data.get('name'):
-                return
-
-        validate_duplicate(Category, 'EXISTS', 'Category', name=data.get('name'))
     
 
 class FavoriteSchema(BaseSchema):
@@ -137,7 +186,7 @@ class FavoriteSchema(BaseSchema):
 
     description = fields.String(validate=[description_validator])
 
-    ranking = fields.Integer(required=True)
+    ranking = RankingField(required=True)
 
     meta_data = fields.Dict(
         load_from="metaData", dump_to="metaData")
@@ -145,7 +194,7 @@ class FavoriteSchema(BaseSchema):
     category_id = fields.Integer(
         load_only=True,
         load_from="categoryId",
-        **common_args(validate=[validate_category_exist]))
+        **common_args())
 
     category = fields.Nested(
         CategorySchema,
@@ -155,6 +204,37 @@ class FavoriteSchema(BaseSchema):
         dump_only=True,
         dump_to="category")
 
+    @pre_dump(pass_many=True)
+    def load_positions(self, data, many):
+        """
+        Compute the positions of a list of favorites in one query
+        """
+        if many and (not self.only or 'ranking' in self.only):
+            data = list(data)
+            Favorite.load_positions(data)
+        return data
+
+
+class FavoriteIdsSchema(BaseSchema):
+    """Schema of the ids of favorites deleted at once"""
+
+    ids = fields.List(fields.Integer(), **common_args(validate=[Length(min=1)]))
+
+
+class FavoriteOrderSchema(BaseSchema):
+    """Schema of a favorites order for a category, listing each favorite
+    once. Category.reorder_favorites checks it lists all of them"""
+
+    favorite_ids = fields.List(
+        fields.Integer(),
+        load_from='favoriteIds',
+        **common_args())
+
+    @validates('favorite_ids')
+    def validate_unique_ids(self, value):
+        if len(value) != len(set(value)):
+            raise_error('INCOMPLETE_ORDER', 'category', fields=['favoriteIds'])
+
 
 class AuditSchema(BaseSchema):
     """ Audit model schema. """
@@ -162,4 +242,32 @@ class AuditSchema(BaseSchema):
     resource_id = fields.Integer(dump_only=True)
     resource_type = fields.String(dump_only=True)
     action = fields.String(dump_only=True)
-    activity = fields.String(dump_only=True)
\ No newline at end of file
+    activity = fields.String(dump_only=True)
+
+
+class FavoriteQuerySchema(BaseSchema):
+    """ Query parameters of the favorite list endpoints. """
+
+    cursor = CursorField(size=3)
+    limit = fields.Integer(missing=50, validate=Range(min=1, max=200))
+
+
+class AuditQuerySchema(BaseSchema):
+    """ Query parameters of the audit list endpoints. """
+
+    cursor = fields.Integer(validate=Range(min=1))
+    limit = fields.Integer(missing=50, validate=Range(min=1, max=200))
+    action = fields.String()
+    resource_id = fields.Integer(load_from='resourceId')
+    created_from = fields.DateTime(load_from='createdFrom')
+    created_to = fields.DateTime(load_from='createdTo')
+    archived = fields.Boolean(missing=False)
+
+    @post_load
+    def to_utc(self, data):
+        """ Compare date ranges with the naive UTC dates stored """
+        for field in ('created_from', 'created_to'):
+            value = data.get(field)
+            if value is not None and value.tzinfo is not None:
+                data[field] = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return data
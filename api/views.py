@@ -1,38 +1,233 @@
 """Module for users resource"""
 # Third-party libraries
+from itertools import islice
+from urllib.parse import urlencode
+
 from flask_restplus import Resource
-from flask import request, jsonify
+from flask import request, jsonify, current_app, Response, stream_with_context
 
 # Middlewares
 from main import api
+from api.database import db
+from .conditional import conditional
+from .response_cache import cached
+from .idempotency import idempotent
+from .serializers import serializer, json_encoder
 # Models
 from .models import Category, Favorite, Audit
-from .schemas import CategorySchema, FavoriteSchema, AuditSchema
+from .schemas import (CategorySchema, FavoriteSchema, FavoriteOrderSchema, AuditSchema,
+    AuditQuerySchema, FavoriteQuerySchema, FavoriteIdsSchema, encode_cursor)
+
+from .messages import SUCCESS_MESSAGES, ERROR_MESSAGES
+from exception.validation import ValidationError
+
+
+def requested_includes():
+    """
+    Returns the optional fields named in the comma separated `include`
+    query string parameter, e.g `?include=rankings`
+    """
+    return [each.strip() for each in request.args.get('include', '').split(',') if each.strip()]
+
+
+def requested_fields(schema_class):
+    """
+    Returns the schema attributes dumped under the names of the comma
+    separated `fields` query string parameter, e.g `?fields=title,ranking`,
+    always with the id, or None when the parameter is not given
+    """
+    names = [each.strip() for each in request.args.get('fields', '').split(',') if each.strip()]
+    if not names:
+        return None
+
+    attributes = {
+        field.dump_to or name: name
+        for name, field in schema_class._declared_fields.items() if not field.load_only
+    }
+    unknown = [name for name in names if name not in attributes]
+    if unknown:
+        raise ValidationError(
+            {
+                'message': ERROR_MESSAGES['UNKNOWN_FIELDS'].format(', '.join(unknown)),
+                'errors': {'fields': unknown}
+            }, 400)
+
+    return ['id'] + [attributes[name] for name in names if name != 'id']
+
+
+NDJSON = 'application/x-ndjson'
+
+
+def stream_requested():
+    """
+    Returns whether the client asked for an NDJSON stream of the whole list,
+    with `?stream=1` or an `Accept: application/x-ndjson` header
+    """
+    return request.args.get('stream') in ('1', 'true') or \
+        request.accept_mimetypes.best_match(['application/json', NDJSON]) == NDJSON
+
+
+def ndjson_response(rows, rows_serializer):
+    """
+    Streams `rows` as one JSON document per line. Rows are dumped by batches
+    of STREAM_BATCH_SIZE, so the response holds at most one batch in memory
+    and starts before the last row is read.
+    """
+    batch_size = current_app.config['STREAM_BATCH_SIZE']
+    encode = json_encoder().encode
+
+    def generate():
+        rows_iterator = iter(rows)
+        batch = list(islice(rows_iterator, batch_size))
+        while batch:
+            for row in rows_serializer.dump(batch, many=True):
+                yield encode(row) + '\n'
+            batch = list(islice(rows_iterator, batch_size))
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON)
+
+
+def favorites_response(query, category_id=None):
+    """
+    Returns a page of the favorites of `query`, of a single category when
+    `category_id` is given, paginated by the query string parameters with
+    the next page linked in the body and a `Link` header
+    """
+    params = FavoriteQuerySchema().load_object_into_schema(request.args.to_dict())
+    fields = requested_fields(FavoriteSchema)
+    favorite_serializer = serializer(FavoriteSchema, only=fields)
+    # the parent of a single category's favorites is already in the session
+    query = Favorite.with_fields(query, fields, join_category=category_id is None)
+
+    if stream_requested():
+        favorites = Favorite.ordered(query, params.get('cursor'), category_id)
+        return ndjson_response(
+            favorites.yield_per(current_app.config['STREAM_BATCH_SIZE']), favorite_serializer)
+
+    favorites, next_cursor = Favorite.page(query, category_id=category_id, **params)
+
+    meta, headers = {"nextCursor": None, "limit": params['limit']}, {}
+    if next_cursor is not None:
+        meta['nextCursor'] = encode_cursor(next_cursor)
+        query_string = urlencode(dict(request.args.to_dict(), cursor=meta['nextCursor']))
+        headers['Link'] = f'<{request.base_url}?{query_string}>; rel="next"'
+
+    return (
+        {
+            "data": favorite_serializer.dump(favorites, many=True),
+            "meta": meta,
+            "message": SUCCESS_MESSAGES["FETCHED"].format("Favorites"),
+            "status": "success",
+        },
+        200,
+        headers,
+    )
+
+
+def audits_response(resource_type, resource_id=None):
+    """
+    Returns a page of the audits of a resource type, or of a single resource
+    when `resource_id` is given, filtered and paginated by the query string
+    parameters
+    """
+    query = AuditQuerySchema().load_object_into_schema(request.args.to_dict())
+    if resource_id is not None:
+        query['resource_id'] = resource_id
+
+    if stream_requested():
+        audits = Audit.iterate(
+            resource_type, batch_size=current_app.config['STREAM_BATCH_SIZE'], **query)
+        return ndjson_response(audits, serializer(AuditSchema))
+
+    audits, next_cursor = Audit.page(resource_type, **query)
+
+    return (
+        {
+            "data": serializer(AuditSchema).dump(audits, many=True),
+            "meta": {"nextCursor": next_cursor, "limit": query['limit']},
+            "message": SUCCESS_MESSAGES["FETCHED"].format("Audits"),
+            "status": "success",
+        },
+        200,
+    )
 
-from .messages import SUCCESS_MESSAGES
+
+def bulk_items(schema, model):
+    """
+    Returns the items of a bulk create payload loaded by `schema`, raising
+    the errors of every invalid item at once, by index, including the
+    conflicts found by `model`
+    """
+    items = request.get_json()
+    max_items = current_app.config['BULK_MAX_ITEMS']
+    if not isinstance(items, list) or not 0 < len(items) <= max_items:
+        raise ValidationError(
+            {
+                'message': ERROR_MESSAGES['BULK_PAYLOAD'].format(max_items)
+            }, 400)
+
+    loaded, errors = schema.load_items_into_schema(items)
+    for index, item_errors in model.conflicts(loaded).items():
+        errors.setdefault(index, {}).update(item_errors)
+    if errors:
+        raise ValidationError(
+            {
+                'message': ERROR_MESSAGES['DEFAULT'],
+                'errors': {index: errors[index] for index in sorted(errors)}
+            }, 400)
+
+    return [loaded[index] for index in range(len(items))]
+
+
+def in_order(instances, ids):
+    """ Returns `instances` sorted in the order of their `ids` """
+    instances = {instance.id: instance for instance in instances}
+    return [instances[pk] for pk in ids]
+
+
+def favorite_versions(favorite_id):
+    """
+    Returns the versions a favorite is dumped from: the favorites of its
+    category, which its position depends on, and the category itself
+    """
+    other = db.aliased(Favorite)
+    category_id = db.session.query(other.category_id).filter(other.id == favorite_id).as_scalar()
+    return [
+        Favorite.version_of(Favorite.query.filter(Favorite.category_id == category_id)),
+        Category.version_of(Category.query.filter(Category.id == category_id)),
+    ]
 
 
 @api.route('/categories')
 class CategoryResource(Resource):
     """Resource class for category"""
 
+    @cached(lambda: ['categories'])
+    # deleted categories leave no date behind, only the ETag tells them
+    @conditional(lambda: [Category.version_of(), Favorite.version_of()], dated=False)
     def get(self):
         """
         Gets categories list
         """
-        categories = Category.query
+        category_serializer = serializer(CategorySchema, include=requested_includes())
+
+        if stream_requested():
+            categories = Category.with_favorites_count(
+                batch_size=current_app.config['STREAM_BATCH_SIZE'])
+            return ndjson_response(categories, category_serializer)
 
-        category_schema = CategorySchema(many=True)
+        categories = Category.with_favorites_count()
 
         return (
             {
-                "data": category_schema.dump(categories).data,
+                "data": category_serializer.dump(categories, many=True),
                 "message": SUCCESS_MESSAGES["FETCHED"].format("Categories"),
                 "status": "success",
             },
             200,
         )
 
+    @idempotent
     def post(self):
         """
         POST method for creating categories.
@@ -40,7 +235,7 @@ class CategoryResource(Resource):
         """
         request_data = request.get_json()
 
-        category_schema = CategorySchema()
+        category_schema = CategorySchema(include=requested_includes())
         category_data = category_schema.load_object_into_schema(
             request_data)
 
@@ -55,33 +250,47 @@ class CategoryResource(Resource):
         }, 201
 
 
+@api.route('/categories/bulk')
+class BulkCategoryResource(Resource):
+    """Resource class for creating many categories at once"""
+
+    @idempotent
+    def post(self):
+        """
+        Creates a list of categories, none of them when any is invalid.
+        Errors are reported by the index of the item in the list.
+        """
+        rows = bulk_items(CategorySchema(), Category)
+
+        ids = Category.bulk_create(rows)
+        categories = in_order(
+            Category.with_favorites_count(Category.query.filter(Category.id.in_(ids))), ids)
+
+        return {
+            'status': 'success',
+            'message': SUCCESS_MESSAGES['CREATED'].format('Categories'),
+            'data' : CategorySchema(many=True, include=requested_includes()).dump(categories).data
+        }, 201
+
+
 @api.route('/categories/audits')
 class AuditCategoryResource(Resource):
     """Resource class for category"""
 
+    @conditional(lambda: [Audit.version_of(Audit.filter(resource_type='CATEGORY'))])
     def get(self):
         """
         Gets audits list for all categories
         """
 
-        audits = Audit.filter(resource_type='CATEGORY')
-
-        audit_schema = AuditSchema(many=True)
-
-        return (
-            {
-                "data": audit_schema.dump(audits).data,
-                "message": SUCCESS_MESSAGES["FETCHED"].format("Audits"),
-                "status": "success",
-            },
-            200,
-        )
+        return audits_response('CATEGORY')
 
 @api.route('/categories/<int:category_id>')
 class SingleFavoriteResource(Resource):
     """Resource class for carrying out operations on a single category"""
 
 
+    @idempotent
     def put(self, category_id):
         """
         Updates category
@@ -93,7 +302,7 @@ class SingleFavoriteResource(Resource):
         
         request_data['id'] = category.id
 
-        category_schema = CategorySchema()
+        category_schema = CategorySchema(include=requested_includes())
         category_data = category_schema.load_object_into_schema(
             request_data, partial=True)
 
@@ -108,6 +317,7 @@ class SingleFavoriteResource(Resource):
         response.status_code = 200
         return response
 
+    @idempotent
     def delete(self, category_id):
         """
         Delete a single category
@@ -129,31 +339,72 @@ class SingleFavoriteResource(Resource):
 class SingleCategoryFavoritesResource(Resource):
     """Resource class for carrying out operations on a single category"""
 
+    @cached(lambda category_id: [f'category:{category_id}'])
+    @conditional(lambda category_id: [
+        Favorite.version_of(Favorite.filter(category_id=category_id)),
+        Category.version_of(Category.filter(id=category_id)),
+    ])
     def get(self, category_id):
         """
         Get a single category favorites
         """
         category = Category.get_or_404(category_id)
 
-        favorites = category.favorites.all()
+        return favorites_response(category.favorites, category.id)
+
+@api.route('/categories/<int:category_id>/favorites/order')
+class CategoryFavoritesOrderResource(Resource):
+    """Resource class for reordering the favorites of a single category"""
 
-        favorite_schema = FavoriteSchema(many=True)
+    def patch(self, category_id):
+        """
+        Reorders all favorites of a category at once.
+
+        Payload should have the following parameters:
+            favoriteIds(list): ids of every favorite of the category in the desired order
+        """
+        category = Category.get_or_404(category_id)
+
+        request_data = request.get_json()
+
+        order_schema = FavoriteOrderSchema()
+        order_data = order_schema.load_object_into_schema(request_data)
+
+        category.reorder_favorites(order_data['favorite_ids'])
+
+        favorites = category.favorites.order_by(Favorite.ranking, Favorite.id)
 
         return (
             {
-                "data": favorite_schema.dump(favorites).data,
-                "message": SUCCESS_MESSAGES["FETCHED"].format("Favorites"),
+                "data": FavoriteSchema(many=True).dump(favorites).data,
+                "message": SUCCESS_MESSAGES["UPDATED"].format("Favorites order"),
                 "status": "success",
             },
             200,
         )
 
+@api.route('/categories/<int:category_id>/audits')
+class SingleCategoryAuditResource(Resource):
+    """Resource class for the audit history of a single category"""
+
+    @conditional(lambda category_id: [
+        Audit.version_of(Audit.filter(resource_type='CATEGORY', resource_id=category_id))
+    ])
+    def get(self, category_id):
+        """
+        Gets audits list of a category, also kept once it is deleted
+        """
+
+        return audits_response('CATEGORY', category_id)
+
+
 @api.route("/favorites")
 class FavoriteResource(Resource):
     """
     Resource class for creating and getting favorites
     """
 
+    @idempotent
     def post(self):
         """
         POST method for creating favorites.
@@ -178,45 +429,87 @@ class FavoriteResource(Resource):
             'data' : favorite_schema.dump(favorite).data
         }, 201
 
+    @cached(lambda: ['favorites'])
+    @conditional(lambda: [Favorite.version_of(), Category.version_of()])
     def get(self):
         """
         Gets list of favorites
         """
-        favorites = Favorite.query
+        return favorites_response(Favorite.query)
 
-        favorite_schema = FavoriteSchema(many=True)
+    @idempotent
+    def delete(self):
+        """
+        Deletes a list of favorites at once, none of them when any is not
+        found. Ids are given as the comma separated `ids` query string
+        parameter, e.g `?ids=1,2,3`, or as an `ids` list in the body.
+        """
+        payload = request.get_json(silent=True) or {}
+        if 'ids' in request.args:
+            payload = {'ids': [each for each in request.args['ids'].split(',') if each.strip()]}
+
+        ids = FavoriteIdsSchema().load_object_into_schema(payload)['ids']
+        ids = sorted(set(ids))
+        max_items = current_app.config['BULK_MAX_ITEMS']
+        if len(ids) > max_items:
+            raise ValidationError(
+                {
+                    'message': ERROR_MESSAGES['BULK_IDS'].format(max_items)
+                }, 400)
+
+        missing = Favorite.bulk_delete(ids)
+        if missing:
+            raise ValidationError(
+                {
+                    'message': ERROR_MESSAGES['NOT_FOUND'].format('Favorite'),
+                    'errors': {'ids': missing}
+                }, 404)
 
         return (
             {
-                "data": favorite_schema.dump(favorites).data,
-                "message": SUCCESS_MESSAGES["FETCHED"].format("Favorites"),
+                "data": {"ids": ids},
+                "message": SUCCESS_MESSAGES["DELETED"].format("Favorites"),
                 "status": "success",
             },
             200,
         )
 
 
+@api.route('/favorites/bulk')
+class BulkFavoriteResource(Resource):
+    """Resource class for creating many favorites at once"""
+
+    @idempotent
+    def post(self):
+        """
+        Creates a list of favorites, none of them when any is invalid.
+        Favorites are ranked as if they were created one after the other.
+        Errors are reported by the index of the item in the list.
+        """
+        rows = bulk_items(FavoriteSchema(), Favorite)
+
+        ids = Favorite.bulk_create(rows)
+        favorites = in_order(
+            Favorite.with_fields(Favorite.query.filter(Favorite.id.in_(ids))), ids)
+
+        return {
+            'status': 'success',
+            'message': SUCCESS_MESSAGES['CREATED'].format('Favorites'),
+            'data' : FavoriteSchema(many=True).dump(favorites).data
+        }, 201
+
+
 @api.route('/favorites/audits')
-class AuditCategoryResource(Resource):
-    """Resource class for category"""
+class AuditFavoriteResource(Resource):
+    """Resource class for favorite audits"""
 
+    @conditional(lambda: [Audit.version_of(Audit.filter(resource_type='FAVORITE'))])
     def get(self):
         """
         Gets audits list for all favorites
         """
         
-        audits = Audit.filter(resource_type='FAVORITE')
-
-        audit_schema = AuditSchema(many=True)
-
-        return (
-            {
-                "data": audit_schema.dump(audits).data,
-                "message": SUCCESS_MESSAGES["FETCHED"].format("Audits"),
-                "status": "success",
-            },
-            200,
-        )
+        return audits_response('FAVORITE')
 
 
 
@@ -224,21 +517,26 @@ class AuditCategoryResource(Resource):
 class SingleFavoriteResource(Resource):
     """Resource class for carrying out operations on a single favorite"""
 
+    @cached(lambda favorite_id: ['favorites'])
+    @conditional(favorite_versions)
     def get(self, favorite_id):
         """
         Get a single favorite
         """
-        favorite = Favorite.get_or_404(favorite_id)
+        fields = requested_fields(FavoriteSchema)
+        favorite = Favorite.get_or_404(
+            favorite_id, Favorite.with_fields(Favorite.query, fields))
 
         return (
             {
-                "data": FavoriteSchema().dump(favorite).data,
+                "data": serializer(FavoriteSchema, only=fields).dump(favorite),
                 "message": SUCCESS_MESSAGES["FETCHED"].format("Favorite"),
                 "status": "success",
             },
             200,
         )
 
+    @idempotent
     def delete(self, favorite_id):
         """
         Delete a single favorite
@@ -255,6 +553,7 @@ class SingleFavoriteResource(Resource):
             200,
         )
 
+    @idempotent
     def put(self, favorite_id):
         """
         Updates favorite
@@ -278,4 +577,19 @@ class SingleFavoriteResource(Resource):
         })
 
         response.status_code = 200
-        return response
\ No newline at end of file
+        return response
+
+
+@api.route('/favorites/<int:favorite_id>/audits')
+class SingleFavoriteAuditResource(Resource):
+    """Resource class for the audit history of a single favorite"""
+
+    @conditional(lambda favorite_id: [
+        Audit.version_of(Audit.filter(resource_type='FAVORITE', resource_id=favorite_id))
+    ])
+    def get(self, favorite_id):
+        """
+        Gets audits list of a favorite, also kept once it is deleted
+        """
+
+        return audits_response('FAVORITE', favorite_id)
@@ -0,0 +1,45 @@
+"""Module with helpers shared by the benchmark scripts."""
+
+# Third party Imports
+import time
+from os import getenv
+
+# Local Imports
+from main import create_app
+from config import Config
+from api.database import db
+
+
+class BenchmarkConfig(Config):
+    """App benchmark configuration."""
+
+    SQLALCHEMY_DATABASE_URI = getenv(
+        'BENCHMARK_DATABASE_URI', default='sqlite:////tmp/favorite_things_bench.db')
+    IDEMPOTENCY_STORE = 'memory'
+
+
+def create_bench_app(uri=None):
+    """ Return an app bound to a freshly created benchmark database """
+    config = BenchmarkConfig
+    if uri:
+        config = type('BenchmarkConfig', (BenchmarkConfig,), dict(SQLALCHEMY_DATABASE_URI=uri))
+    app = create_app(config)
+    app.app_context().push()
+    db.drop_all()
+    db.create_all()
+    return app
+
+
+def timed(func, *args, **kwargs):
+    """ Run `func` and return its duration in milliseconds """
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000
+
+
+def report(title, headers, rows):
+    """ Print a benchmark result table """
+    print(f'\n{title}')
+    widths = [max(len(str(each)) for each in column) for column in zip(headers, *rows)]
+    for row in [headers] + rows:
+        print('  '.join(str(each).rjust(width) for each, width in zip(row, widths)))
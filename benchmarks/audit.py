@@ -0,0 +1,77 @@
+"""
+Compare write endpoint latency with the sync and buffered audit sinks.
+
+Favorites are created and then renamed through the API with the audit row
+either saved in the request transaction (sync) or spooled and bulk inserted
+in the background (buffered). The buffered drain time is reported apart as
+it is paid off the request path.
+
+Usage:
+    BENCHMARK_DATABASE_URI=mysql+pymysql://localhost/britecore_bench \\
+        python -m benchmarks.audit --requests 500 --buffer-size 100
+"""
+
+# Third party Imports
+import argparse
+import json
+from statistics import median
+
+# Local Imports
+from benchmarks import create_bench_app, timed, report
+from api.audit_sinks import AUDIT_SINKS
+from api.database import db
+from api.models import Audit, Category, Favorite
+
+
+def percentile(durations, rank):
+    return sorted(durations)[int(len(durations) * rank / 100) - 1]
+
+
+def run(client, base_url, category_id, prefix, requests):
+    """ Time creating then renaming `requests` favorites """
+    durations = []
+    for each in range(requests):
+        payload = dict(title=f'{prefix}-{each}', ranking=1, categoryId=category_id)
+        durations.append(timed(
+            client.post, f'{base_url}/favorites',
+            data=json.dumps(payload), content_type='application/json'))
+    for favorite in Favorite.filter(category_id=category_id).all():
+        payload = dict(title=f'{favorite.title}-renamed')
+        durations.append(timed(
+            client.put, f'{base_url}/favorites/{favorite.id}',
+            data=json.dumps(payload), content_type='application/json'))
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--buffer-size', type=int, default=100)
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    app.config['AUDIT_BUFFER_SIZE'] = args.buffer_size
+    client = app.test_client()
+    base_url = app.config['API_BASE_URL_V1']
+
+    rows = []
+    for mode in ('sync', 'buffered'):
+        sink = app.extensions['audit_sink'] = AUDIT_SINKS[mode](app)
+        category_id = Category(name=f'audit-{mode}').save().id
+        durations = run(client, base_url, category_id, mode, args.requests)
+        drain = timed(sink.close)
+        rows.append([
+            mode, len(durations), round(median(durations), 2),
+            round(percentile(durations, 95), 2), round(sum(durations) / 1000, 2),
+            round(drain, 2)
+        ])
+
+    report(
+        f'Write endpoint latency by audit sink ({db.engine.name})',
+        ['sink', 'requests', 'median ms', 'p95 ms', 'total s', 'drain ms'],
+        rows)
+    print(f'\naudit rows: {Audit.query.count()}')
+
+
+if __name__ == '__main__':
+    main()
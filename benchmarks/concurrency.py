@@ -0,0 +1,119 @@
+"""
+Stress concurrent favorite mutations and verify rankings stay consistent.
+
+Several threads save, move and delete favorites through the models, each
+with its own session, spread over a few categories. The run reports the
+throughput and checks that every category ends with dense and unique
+rankings (dense mode) or unique keys (sparse mode).
+
+Usage:
+    BENCHMARK_DATABASE_URI=mysql+pymysql://localhost/britecore_bench \\
+        python -m benchmarks.concurrency --threads 8 --categories 4 --operations 200
+"""
+
+# Third party Imports
+import argparse
+import itertools
+import random
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+
+# Local Imports
+from benchmarks import create_bench_app, report
+from api.database import db
+from api.models import Category, Favorite
+
+sequence = itertools.count()
+
+
+def mutate(category_ids):
+    """ Apply one random insert, move or delete to a random category """
+    category_id = random.choice(category_ids)
+
+    ids = [row.id for row in Favorite.filter(category_id=category_id).with_entities(Favorite.id)]
+    action = random.choice(['insert', 'insert', 'move', 'delete']) if ids else 'insert'
+    # positions may be out of range by the time the category is locked,
+    # some are picked out of range on purpose for the engines to clamp
+    ranking = random.randint(-1, len(ids) + 2)
+
+    if action == 'insert':
+        Favorite(title=f'stress-{next(sequence)}', ranking=ranking, category_id=category_id).save()
+        return
+
+    favorite = Favorite.get(random.choice(ids))
+    if favorite is None:
+        return
+    if action == 'move':
+        favorite.update(ranking=ranking)
+    else:
+        favorite.delete()
+
+
+def worker(app, category_ids, operations, counters):
+    with app.app_context():
+        for each in range(operations):
+            try:
+                mutate(category_ids)
+                counters['done'] += 1
+            # favorites moved or deleted by another thread may be gone by now
+            except (OperationalError, StaleDataError):
+                db.session.rollback()
+                counters['failed'] += 1
+        db.session.remove()
+
+
+def verify(category_ids, mode):
+    """ Return the ids of the categories whose rankings are inconsistent """
+    invalid = []
+    for category_id in category_ids:
+        rankings = sorted(
+            row.ranking for row in
+            Favorite.filter(category_id=category_id).with_entities(Favorite.ranking))
+        expected = list(range(1, len(rankings) + 1))
+
+        if (mode == 'dense' and rankings != expected) or len(set(rankings)) != len(rankings):
+            invalid.append(category_id)
+    return invalid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--categories', type=int, default=4)
+    parser.add_argument('--operations', type=int, default=200)
+    parser.add_argument('--mode', choices=['dense', 'sparse'], default='dense')
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    app.config['RANKING_MODE'] = args.mode
+    category_ids = [
+        Category(name=f'stress-{each}').save().id for each in range(args.categories)
+    ]
+
+    counters = dict(done=0, failed=0)
+    threads = [
+        threading.Thread(target=worker, args=(app, category_ids, args.operations, counters))
+        for each in range(args.threads)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    invalid = verify(category_ids, args.mode)
+    report(
+        f'Concurrent rank mutations ({db.engine.name}, {args.mode} mode)',
+        ['threads', 'categories', 'mutations', 'failed', 'ops/sec', 'consistent'],
+        [[
+            args.threads, args.categories, counters['done'], counters['failed'],
+            round(counters['done'] / elapsed, 1), 'yes' if not invalid else f'no {invalid}'
+        ]])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Benchmark the per-mutation latency of the dense and sparse ranking engines
+against the full-category self-join rerank they replaced.
+
+Usage:
+    BENCHMARK_DATABASE_URI=mysql+pymysql://localhost/britecore_bench \\
+        python -m benchmarks.ranking --sizes 100 10000 100000
+
+The legacy rerank is quadratic in the category size, so it is skipped for
+categories larger than `--legacy-max`.
+"""
+
+# Third party Imports
+import argparse
+import itertools
+from statistics import median
+
+from sqlalchemy import text
+
+# Local Imports
+from benchmarks import create_bench_app, timed, report
+from api.database import db
+from api.models import Category, Favorite, ranking_engines
+
+LEGACY_MYSQL_QUERY = """
+    UPDATE favorites f
+    JOIN (
+        SELECT t.id, count(*) AS rank_below
+        FROM favorites t
+        JOIN favorites tr ON tr.ranking <= t.ranking
+        WHERE tr.category_id = :category_id
+        GROUP BY t.id
+    ) c ON c.id=f.id
+    SET f.ranking = c.rank_below
+    WHERE f.id != :pk AND f.category_id = :category_id
+"""
+
+# Same quadratic count for dialects without UPDATE ... JOIN, used for timing only
+LEGACY_PORTABLE_QUERY = """
+    UPDATE favorites SET ranking = (
+        SELECT count(*) FROM favorites tr
+        WHERE tr.category_id = :category_id AND tr.ranking <= favorites.ranking
+    )
+    WHERE id != :pk AND category_id = :category_id
+"""
+
+
+sequence = itertools.count()
+
+
+def legacy_rerank(pk, category_id):
+    query = LEGACY_MYSQL_QUERY if db.engine.name == 'mysql' else LEGACY_PORTABLE_QUERY
+    db.engine.execute(text(query), pk=pk or 0, category_id=category_id)
+
+
+class EngineStrategy(object):
+    """ Mutations maintained by one of the ranking engines """
+
+    def __init__(self, mode):
+        self.name = mode
+        self.engine = ranking_engines[mode]
+
+    def insert(self, favorite):
+        self.engine.insert(favorite)
+        db.session.add(favorite)
+        db.session.commit()
+
+    def move(self, favorite, ranking):
+        category_id, old_ranking = favorite.category_id, favorite.ranking
+        favorite.ranking = ranking
+        self.engine.move(favorite, category_id, old_ranking)
+        db.session.commit()
+
+    def remove(self, favorite):
+        self.engine.remove(favorite)
+        db.session.delete(favorite)
+        db.session.commit()
+
+
+class LegacyStrategy(object):
+    """ Mutations followed by the legacy full-category rerank """
+
+    name = 'self-join'
+    engine = ranking_engines['dense']
+
+    def insert(self, favorite):
+        db.session.add(favorite)
+        db.session.commit()
+        legacy_rerank(favorite.id, favorite.category_id)
+
+    def move(self, favorite, ranking):
+        favorite.ranking = ranking
+        db.session.commit()
+        legacy_rerank(favorite.id, favorite.category_id)
+
+    def remove(self, favorite):
+        db.session.delete(favorite)
+        db.session.commit()
+        legacy_rerank(None, favorite.category_id)
+
+
+def seed_category(size, key_at):
+    """ Create a category holding `size` favorites ranked 1..size """
+    result = db.engine.execute(
+        Category.__table__.insert(), name=f'bench-{size}-{next(sequence)}')
+    category_id = result.inserted_primary_key[0]
+    rows = [
+        dict(title=f'{category_id}-{each}', ranking=key_at(each), category_id=category_id)
+        for each in range(1, size + 1)
+    ]
+    for start in range(0, size, 10000):
+        db.engine.execute(Favorite.__table__.insert(), rows[start:start + 10000])
+    return category_id
+
+
+def run(strategy, size, repeat):
+    """ Time insert, move and remove mutations on a category of `size` favorites """
+    category_id = seed_category(size, strategy.engine.key_at)
+    timings = dict(insert=[], move=[], remove=[])
+
+    for each in range(repeat):
+        middle, target = size // 2 or 1, size // 4 or 1
+        favorite = Favorite(
+            title=f'{category_id}-new-{each}', ranking=middle, category_id=category_id)
+
+        timings['insert'].append(timed(strategy.insert, favorite))
+        timings['move'].append(timed(strategy.move, favorite, target))
+        timings['remove'].append(timed(strategy.remove, favorite))
+
+    return [round(median(timings[each]), 2) for each in ('insert', 'move', 'remove')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', nargs='+', type=int, default=[100, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--legacy-max', type=int, default=10000)
+    args = parser.parse_args()
+
+    create_bench_app()
+
+    rows = []
+    for size in args.sizes:
+        for strategy in (EngineStrategy('dense'), EngineStrategy('sparse'), LegacyStrategy()):
+            if isinstance(strategy, LegacyStrategy) and size > args.legacy_max:
+                rows.append([size, strategy.name, 'skipped', 'skipped', 'skipped'])
+                continue
+            rows.append([size, strategy.name] + run(strategy, size, args.repeat))
+
+    report(
+        f'Median ms per mutation ({db.engine.name}, {args.repeat} runs)',
+        ['favorites', 'strategy', 'insert', 'move', 'remove'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Compare full-category reranks across database dialects.
+
+For each database the native ROW_NUMBER() statement is timed against the
+portable read-then-CASE rebalance and the legacy quadratic self-join.
+
+Usage:
+    python -m benchmarks.rerank --sizes 1000 10000 \\
+        --uris sqlite:////tmp/rerank.db \\
+               mysql+pymysql://localhost/britecore_bench \\
+               postgresql://localhost/britecore_bench
+"""
+
+# Third party Imports
+import argparse
+from statistics import median
+
+# Local Imports
+from benchmarks import create_bench_app, timed, report
+from benchmarks.ranking import seed_category, legacy_rerank
+from api.database import db
+from api.models import ranking_engines
+
+
+def scramble(category_id):
+    """ Leave gaps between the rankings of a category so every rerank writes rows """
+    table = ranking_engines['dense'].table
+    db.session.execute(
+        table.update().where(table.c.category_id == category_id)
+        .values(ranking=table.c.ranking * 2))
+    db.session.commit()
+
+
+def native(category_id):
+    ranking_engines['dense'].rebalance(category_id)
+    db.session.commit()
+
+
+def portable(category_id):
+    ranking_engines['dense'].rebalance_portable(category_id)
+    db.session.commit()
+
+
+def legacy(category_id):
+    legacy_rerank(None, category_id)
+
+
+def run(rerank, size, repeat):
+    category_id = seed_category(size, ranking_engines['dense'].key_at)
+    timings = []
+    for each in range(repeat):
+        scramble(category_id)
+        timings.append(timed(rerank, category_id))
+    return round(median(timings), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--uris', nargs='+', default=[None])
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--legacy-max', type=int, default=10000)
+    args = parser.parse_args()
+
+    rows = []
+    for uri in args.uris:
+        app = create_bench_app(uri)
+        dialect = db.engine.dialect
+        version = '.'.join(str(each) for each in dialect.server_version_info[:2])
+        has_native = ranking_engines['dense'].rerank_statement(dialect) is not None
+
+        for size in args.sizes:
+            rows.append([
+                f'{dialect.name} {version}', size,
+                run(native, size, args.repeat) if has_native else 'n/a',
+                run(portable, size, args.repeat),
+                run(legacy, size, args.repeat) if size <= args.legacy_max else 'skipped',
+            ])
+        db.session.remove()
+
+    report(
+        f'Median ms per full category rerank ({args.repeat} runs)',
+        ['database', 'favorites', 'row_number', 'portable', 'self-join'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Compare the rows per second dumped by the marshmallow schemas and by their
+precompiled serializers.
+
+Rows are loaded once, then dumped and encoded as the list endpoints do,
+either with `Schema(many=True).dump` and `flask.json.dumps` per row, or
+with the compiled serializer and one reused encoder. The favorites pass
+includes the query loading their positions, run by both paths.
+
+Usage:
+    BENCHMARK_DATABASE_URI=mysql+pymysql://localhost/britecore_bench \\
+        python -m benchmarks.serializers --size 10000 --repeat 5
+"""
+
+# Third party Imports
+import argparse
+from statistics import median
+
+from flask import json
+
+# Local Imports
+from benchmarks import create_bench_app, timed, report
+from benchmarks.ranking import seed_category
+from api.database import db
+from api.models import Audit, Category, Favorite
+from api.schemas import AuditSchema, CategorySchema, FavoriteSchema
+from api.serializers import serializer, json_encoder
+
+
+def schema_dump(schema_class, rows):
+    return [json.dumps(row) for row in schema_class(many=True).dump(rows).data]
+
+
+def compiled_dump(schema_class, rows):
+    encode = json_encoder().encode
+    return [encode(row) for row in serializer(schema_class).dump(rows, many=True)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    category_id = seed_category(args.size, lambda position: position)
+    db.engine.execute(Category.__table__.insert(), [
+        dict(name=f'serializers-{each}') for each in range(args.size)])
+    db.engine.execute(Audit.__table__.insert(), [
+        dict(resource_id=each, resource_type='FAVORITE', action='ADDED', activity=f'{each}')
+        for each in range(args.size)])
+
+    datasets = [
+        (FavoriteSchema, Favorite.query.options(db.joinedload(Favorite.category))
+         .filter_by(category_id=category_id).all()),
+        (CategorySchema, list(Category.with_favorites_count())),
+        (AuditSchema, Audit.query.all()),
+    ]
+
+    rows = []
+    with app.test_request_context():
+        for schema_class, dataset in datasets:
+            assert schema_dump(schema_class, dataset) == compiled_dump(schema_class, dataset)
+            result = [schema_class.__name__, len(dataset)]
+            for dump in (schema_dump, compiled_dump):
+                duration = median(
+                    timed(dump, schema_class, dataset) for each in range(args.repeat))
+                result.append(round(len(dataset) / duration * 1000))
+            rows.append(result + [round(result[3] / result[2], 1)])
+
+    report(
+        f'Rows dumped and encoded per second ({db.engine.name})',
+        ['schema', 'rows', 'marshmallow rows/s', 'compiled rows/s', 'speedup'],
+        rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Compare time-to-first-byte and peak memory of NDJSON streams.
+
+A category is seeded with each size of favorites and streamed through
+`GET /categories/<id>/favorites?stream=1`. Streams are served from a server
+side cursor in STREAM_BATCH_SIZE batches, so time-to-first-byte and peak
+Python memory should stay flat as the category grows.
+
+Usage:
+    BENCHMARK_DATABASE_URI=mysql+pymysql://localhost/britecore_bench \\
+        python -m benchmarks.streaming --sizes 1000 10000 100000
+"""
+
+# Third party Imports
+import argparse
+import time
+import tracemalloc
+
+# Local Imports
+from benchmarks import create_bench_app, report
+from benchmarks.ranking import seed_category
+from api.database import db
+
+
+def stream(client, url):
+    """ Return the time to first byte in ms, the total time in ms and the line count """
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(url, buffered=False)
+    chunks = iter(response.response)
+
+    first = next(chunks)
+    first_byte = (time.perf_counter() - start) * 1000
+    lines = first.count(b'\n') + sum(chunk.count(b'\n') for chunk in chunks)
+    total = (time.perf_counter() - start) * 1000
+
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    response.close()
+    return first_byte, total, lines, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    client = app.test_client()
+    base_url = app.config['API_BASE_URL_V1']
+
+    rows = []
+    for size in args.sizes:
+        category_id = seed_category(size, lambda position: position)
+        db.session.remove()
+        first_byte, total, lines, peak = stream(
+            client, f'{base_url}/categories/{category_id}/favorites?stream=1')
+        rows.append([
+            size, lines, round(first_byte, 1), round(total, 1), round(peak / 2 ** 20, 1)
+        ])
+
+    report(
+        f'NDJSON favorites stream ({db.engine.name}, '
+        f'batches of {app.config["STREAM_BATCH_SIZE"]})',
+        ['favorites', 'lines', 'first byte ms', 'total ms', 'peak MiB'],
+        rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -29,6 +29,47 @@ class Config(object):
 
     FLASKS3_BUCKET_NAME= getenv('AWS_BUCKET')
 
+    # Either dense (1..n rankings) or sparse (gap-based sort keys)
+    RANKING_MODE = getenv('RANKING_MODE', 'dense')
+
+    # Either sync (audit rows saved with the change) or buffered (write-behind)
+    AUDIT_SINK = getenv('AUDIT_SINK', 'sync')
+    AUDIT_BUFFER_SIZE = int(getenv('AUDIT_BUFFER_SIZE', 100))
+    AUDIT_FLUSH_INTERVAL = float(getenv('AUDIT_FLUSH_INTERVAL', 1.0))
+    AUDIT_SPOOL_PATH = getenv('AUDIT_SPOOL_PATH', '/tmp/favorite-things-audit.spool')
+
+    # Directory of the compressed segments written by `flask audit-archive`
+    AUDIT_ARCHIVE_PATH = getenv('AUDIT_ARCHIVE_PATH', 'archive/audit')
+
+    # Rows fetched and serialized at a time by NDJSON streams
+    STREAM_BATCH_SIZE = int(getenv('STREAM_BATCH_SIZE', 1000))
+
+    # Most items accepted by a bulk create request
+    BULK_MAX_ITEMS = int(getenv('BULK_MAX_ITEMS', 500))
+
+    # Either none, memory (LRU per worker) or shared (Redis at RESPONSE_CACHE_URL)
+    RESPONSE_CACHE = getenv('RESPONSE_CACHE', 'none')
+    RESPONSE_CACHE_SIZE = int(getenv('RESPONSE_CACHE_SIZE', 1024))
+    RESPONSE_CACHE_TTL = float(getenv('RESPONSE_CACHE_TTL', 60))
+    RESPONSE_CACHE_URL = getenv('RESPONSE_CACHE_URL', 'redis://localhost:6379/0')
+
+    # Responses of these types are gzip (or brotli, when installed) compressed
+    # for the clients accepting it, complete ones from this size in bytes
+    COMPRESSION_MIMETYPES = ['application/json', 'application/x-ndjson']
+    COMPRESSION_MIN_SIZE = int(getenv('COMPRESSION_MIN_SIZE', 500))
+    COMPRESSION_LEVEL = int(getenv('COMPRESSION_LEVEL', 6))
+
+    # Either shared (Redis at IDEMPOTENCY_URL) or memory (per worker) store of
+    # the responses replayed for retried requests with an Idempotency-Key.
+    # Behind API Gateway a retry usually reaches another Lambda container,
+    # which only the shared store replays it from
+    IDEMPOTENCY_STORE = getenv('IDEMPOTENCY_STORE', 'shared')
+    IDEMPOTENCY_SIZE = int(getenv('IDEMPOTENCY_SIZE', 10000))
+    IDEMPOTENCY_TTL = float(getenv('IDEMPOTENCY_TTL', 24 * 60 * 60))
+    IDEMPOTENCY_LOCK_TTL = float(getenv('IDEMPOTENCY_LOCK_TTL', 30))
+    IDEMPOTENCY_URL = getenv('IDEMPOTENCY_URL', 'redis://localhost:6379/0')
+    IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
 class ProductionConfig(Config):
     """App production configuration."""
     pass
@@ -52,6 +93,8 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = getenv(
         'TEST_DATABASE_URI', default='mysql+pymysql://localhost/britecore_test')
 
+    IDEMPOTENCY_STORE = 'memory'
+
     JWT_SECRET_KEY='\x95T\xe2\x8f\x8a\xa1a\xb0\x8d\x01\xd3\xea\x93X\xfb\x91ik\x9d\x96f\x83\xae\xab'
     FLASK_ENV = 'testing'
 
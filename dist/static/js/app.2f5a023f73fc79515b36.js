@@ -1,2 +0,0 @@
-webpackJsonp([5],{"7zck":function(t,e){},NHnr:function(t,e,a){"use strict";Object.defineProperty(e,"__esModule",{value:!0});var n=a("7+uW"),i={render:function(){var t=this,e=t.$createElement,a=t._self._c||e;return a("span",[a("v-navigation-drawer",{staticClass:"cyan lighten-2",attrs:{app:"",dark:"","disable-resize-watcher":""},model:{value:t.drawer,callback:function(e){t.drawer=e},expression:"drawer"}},[a("v-list",[t._l(t.items,function(e,n){return[a("v-list-tile",{key:n},[a("v-list-tile-content",[t._v("\n                        "+t._s(e.title)+"\n                    ")])],1),t._v(" "),a("v-divider",{key:"divider-"+n})]})],2)],1),t._v(" "),a("v-toolbar",{attrs:{app:"",color:"cyan darken-3",dark:""}},[a("v-toolbar-side-icon",{staticClass:"hidden-md-and-up",on:{click:function(e){t.drawer=!t.drawer}}}),t._v(" "),a("v-spacer",{staticClass:"hidden-md-and-up"}),t._v(" "),a("router-link",{attrs:{to:"/"}},[a("v-toolbar-title",{attrs:{"data-cy":"titleBtn"}},[t._v(t._s(t.appTitle))])],1),t._v(" "),a("div",{staticClass:"hidden-sm-and-down"},[a("v-btn",{staticClass:"hidden-sm-and-down nav-menu",attrs:{flat:"",to:"/categories"}},[t._v("Categories")]),t._v(" "),a("v-btn",{staticClass:"hidden-sm-and-down nav-menu",attrs:{flat:"",to:"/favorites"}},[t._v("Favorites")])],1)],1)],1)},staticRenderFns:[]};var s={name:"App",components:{AppNavigation:a("VU/8")({name:"AppNavigation",data:function(){return{appTitle:"BriteCore",drawer:!1,items:{}}}},i,!1,function(t){a("oqXA")},"data-v-525ab9db",null).exports}},o={render:function(){var t=this.$createElement,e=this._self._c||t;return e("v-app",{attrs:{id:"app"}},[e("app-navigation"),this._v(" "),e("v-content",{attrs:{transition:"slide-x-transition"}},[e("router-view")],1)],1)},staticRenderFns:[]},r=a("VU/8")(s,o,!1,null,null,null).exports,c=a("YaEn"),d=a("3EgV"),u=a.n(d);a("7zck");n.default.use(u.a,{iconfont:"md"});var l=a("//Fk"),p=a.n(l),v=a("NYxO"),f=a("424j"),m=a("mtWM"),h=a.n(m),g=a("lbHh");n.default.use(v.a);var _=new v.a.Store({plugins:[Object(f.a)({storage:{getItem:function(t){return g.get(t)},setItem:function(t,e){return g.set(t,e,{expires:1,secure:!0})},removeItem:function(t){return g.remove(t)}}})],state:{api:"https://skudz1hazf.execute-api.us-east-2.amazonaws.com/dev/api/v1",categories:[],favorites:[],categoriesAudits:[],favoritesAudits:[]},mutations:{setCategories:function(t,e){t.categories=e},setFavorites:function(t,e){t.favorites=e},setCategoriesAudits:function(t,e){t.categoriesAudits=e},setFavoritesAudits:function(t,e){t.favoritesAudits=e}},actions:{getCategories:function(t){var e=t.state,a=t.commit,n=e.api+"/categories";return h.a.get(n,{headers:{"Content-Type":"application/json"}}).then(function(t){a("setCategories",t.data.data)})},getCategoriesAudits:function(t){var e=t.state,a=t.commit,n=e.api+"/categories/audits";return h.a.get(n,{headers:{"Content-Type":"application/json"}}).then(function(t){a("setCategoriesAudits",t.data.data)})},getFavoritesAudits:function(t){var e=t.state,a=t.commit,n=e.api+"/favorites/audits";return h.a.get(n,{headers:{"Content-Type":"application/json"}}).then(function(t){a("setFavoritesAudits",t.data.data)})},getFavorites:function(t,e){var a=t.state,n=t.commit,i=a.api+"/favorites";e.categoryId&&(i=a.api+"/categories/"+e.categoryId+"/favorites");return h.a.get(i,{headers:{"Content-Type":"application/json"}}).then(function(t){n("setFavorites",t.data.data)})},update:function(t,e){var a={"Content-Type":"application/json"},n=""+t.state.api+e.endpoint;return new p.a(function(t,i){h.a.put(n,e.payload,{headers:a}).then(function(e){t(e.data.data)}).catch(function(t){t.response&&i(t.response.data.message)})})},delete:function(t,e){var a=t.state,n=(t.commit,{"Content-Type":"application/json"}),i=""+a.api+e;return new p.a(function(t,e){h.a.delete(i,{headers:n}).then(function(){t()}).catch(function(t){t&&e(t.response.data.message)})})},add:function(t,e){var a={"Content-Type":"application/json"},n=""+t.state.api+e.endpoint;return new p.a(function(t,i){h.a.post(n,e.payload,{headers:a}).then(function(e){t(e.data.data)}).catch(function(t){t.response&&i(t.response.data.message)})})}}});n.default.config.productionTip=!1,new n.default({el:"#app",router:c.a,store:_,components:{App:r},template:"<App/>"})},YaEn:function(t,e,a){"use strict";var n=a("7+uW"),i=a("/ocq"),s={render:function(){var t=this.$createElement,e=this._self._c||t;return e("v-container",{staticStyle:{"max-height":"100vh"},attrs:{fluid:"","fill-height":""}},[e("v-layout",{attrs:{"justify-center":"","align-center":"",column:"","pa-5":""}},[e("div",{staticClass:"display-1 font-weight-black black--text text-xs-center mb-4"},[this._v("Welcome to my BriteCore Project")]),this._v(" "),e("div",{staticClass:"font-weight-black black--text text-xs-center"},[this._v("Built By:")]),this._v(" "),e("div",{staticClass:"font-weight-black black--text text-xs-center"},[this._v("Faniyi Olaoluwa")])])],1)},staticRenderFns:[]};var o={name:"home",components:{LandingPage:a("VU/8")({name:"LandingPage"},s,!1,function(t){a("pRP+")},"data-v-0477db92",null).exports}},r={render:function(){var t=this.$createElement,e=this._self._c||t;return e("span",[e("landing-page")],1)},staticRenderFns:[]},c=a("VU/8")(o,r,!1,null,null,null).exports;n.default.use(i.a);var d=new i.a({mode:"history",base:Object({NODE_ENV:"production"}).BASE_URL,routes:[{path:"/",name:"home",component:c},{path:"/categories",name:"categories",component:function(){return Promise.all([a.e(0),a.e(2)]).then(a.bind(null,"S2YK"))}},{path:"/favorites/add",name:"favoriteadd",component:function(){return Promise.all([a.e(0),a.e(1)]).then(a.bind(null,"/wwj"))}},{path:"/favorites/:id/edit",name:"favoriteedit",component:function(){return Promise.all([a.e(0),a.e(1)]).then(a.bind(null,"/wwj"))}},{path:"/favorites",name:"favorites",component:function(){return Promise.all([a.e(0),a.e(3)]).then(a.bind(null,"96+r"))}}]});e.a=d},oqXA:function(t,e){},"pRP+":function(t,e){}},["NHnr"]);
-//# sourceMappingURL=app.2f5a023f73fc79515b36.js.map
\ No newline at end of file
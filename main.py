@@ -12,6 +12,10 @@ from exception import exception_blueprint
 from exception.validation import ValidationError
 from config import config, AppConfig
 from api.database import db
+from api.audit_sinks import init_audit_sink
+from api.response_cache import init_response_cache
+from api.compression import init_compression
+from api.idempotency import init_idempotency
 
 api = Api(api_blueprint, doc=False)
 
@@ -45,6 +49,18 @@ def create_app(config=AppConfig):
 
     s3.init_app(app)
 
+    # attach the sink receiving audit entries
+    init_audit_sink(app)
+
+    # attach the cache of the GET responses
+    init_response_cache(app)
+
+    # compress the responses for the clients accepting it
+    init_compression(app)
+
+    # replay the responses of write requests retried with an Idempotency-Key
+    init_idempotency(app)
+
     import api.views
 
     # initialize migration scripts
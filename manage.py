@@ -28,8 +28,10 @@ def redirect_all(path):
 
 @app.route('/health')
 def health_check():
-    """Checks the health of application and returns 'Health App Server' as json."""
-    return jsonify(dict(message='Healthy App Server')), 200
+    """Checks the health of application and returns 'Health App Server' as json,
+    with the hit and miss counters of the response cache."""
+    return jsonify(dict(
+        message='Healthy App Server', cache=app.extensions['response_cache'].stats())), 200
 
 @app.cli.command(context_settings=dict(token_normalize_func=str.lower))
 def seed():
@@ -99,6 +101,49 @@ def create_entry(category_data):
         print(e)
         pass
 
+@app.cli.command(context_settings=dict(token_normalize_func=str.lower))
+def rebalance():
+    """
+    Rewrites the favorite rankings of every category for the configured RANKING_MODE,
+    i.e evenly spaced keys for sparse mode and 1..n for dense mode
+
+    Return:
+        func: call the function if successful or the click help option if unsuccesful
+    """
+    from api.models import Category, Favorite
+    from api.response_cache import invalidate
+
+    print('Rebalancing rankings')
+
+    engine = Favorite.ranking_engine()
+    for category in Category.query:
+        engine.rebalance(category.id)
+        invalidate(['favorites', f'category:{category.id}'])
+        db.session.commit()
+
+    print('Rebalanced rankings')
+
+@app.cli.command('audit-archive', context_settings=dict(token_normalize_func=str.lower))
+@click.option('--days', default=90, help='Archive audits older than this number of days')
+@click.option('--batch-size', default=1000, help='Number of audits moved per transaction')
+def audit_archive(days, batch_size):
+    """
+    Moves old audits out of the audit table into compressed daily segment files
+    under AUDIT_ARCHIVE_PATH
+
+    Return:
+        func: call the function if successful or the click help option if unsuccesful
+    """
+    from datetime import datetime, timedelta
+    from api.models import Audit
+
+    print(f'Archiving audits older than {days} days')
+
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    archived = Audit.archive().archive(cutoff, batch_size)
+
+    print(f'Archived {archived} audits')
+
 @app.cli.command(context_settings=dict(token_normalize_func=str.lower))
 def upload():
     """
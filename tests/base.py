@@ -1,5 +1,8 @@
+from contextlib import contextmanager
+
 from faker import Faker
 from faker.providers import BaseProvider
+from sqlalchemy import event
 
 import random, string
 
@@ -14,4 +17,16 @@ class CustomFaker(BaseProvider):
         industries = ['automobile', 'education', 'health', 'information technology', 'banking', 'agriculture']
         return industries[random.randint(0,len(industries) - 1)]
 
-fake.add_provider(CustomFaker)
\ No newline at end of file
+fake.add_provider(CustomFaker)
+
+
+@contextmanager
+def count_queries(engine):
+    """ Collect the SQL statements executed on `engine` within the block """
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
@@ -0,0 +1,112 @@
+"""Test audit archive module"""
+from datetime import datetime, timedelta
+
+import pytest
+from flask import json
+
+# Local Modules
+from api.models import Audit
+
+from tests.base import fake
+from tests.test_views import BASE_URL
+
+
+@pytest.fixture(scope='function')
+def archive_path(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'AUDIT_ARCHIVE_PATH', str(tmp_path / 'audit'))
+    return tmp_path / 'audit'
+
+
+def create_audits(resource_id, days_ago, count=1):
+    return [
+        Audit(resource_id=resource_id, resource_type='FAVORITE', action='UPDATED',
+              activity=fake.alphanumeric(20),
+              created_date=datetime.utcnow() - timedelta(days=days_ago)).save()
+        for each in range(count)
+    ]
+
+
+class TestAuditArchive:
+    """Test moving audits into compressed segments
+    """
+
+    def test_archive_moves_old_audits(self, init_db, archive_path):
+        """Test audits older than the cutoff leave the table for daily segments
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                archive_path (Path): Fixture to archive into a temporary directory
+        """
+        old = [each.id for each in
+               create_audits(7001, days_ago=120, count=3) + create_audits(7001, days_ago=100)]
+        recent = [each.id for each in create_audits(7001, days_ago=1)]
+
+        archived = Audit.archive().archive(datetime.utcnow() - timedelta(days=90), batch_size=2)
+
+        assert archived == 4
+        assert [each.id for each in Audit.filter(resource_id=7001)] == recent
+        assert len(list(archive_path.glob('*.jsonl.gz'))) == 2
+
+        rows = Audit.archive().page('FAVORITE', limit=10, resource_id=7001)
+        assert [row['id'] for row in rows] == sorted(old, reverse=True)
+
+    def test_rows_archived_twice_are_read_once(self, init_db, archive_path):
+        """Test a batch written again after an interrupted run is deduplicated
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                archive_path (Path): Fixture to archive into a temporary directory
+        """
+        audit = create_audits(7002, days_ago=100)[0]
+        row = {column.name: getattr(audit, column.name) for column in Audit.__table__.columns}
+
+        Audit.archive().write([row])
+        Audit.archive().write([row])
+
+        assert [each['id'] for each in Audit.archive().page('FAVORITE', resource_id=7002)] == [audit.id]
+
+    def test_audits_endpoint_reads_through_archive(self, client, init_db, archive_path):
+        """Test archived audits are only listed when asked for
+
+            Args:
+                client(FlaskClient): fixture to get flask test client
+                init_db(SQLAlchemy): fixture to initialize the test database
+                archive_path (Path): Fixture to archive into a temporary directory
+        """
+        old = [each.id for each in create_audits(7003, days_ago=100, count=2)]
+        recent = [each.id for each in create_audits(7003, days_ago=1)]
+        Audit.archive().archive(datetime.utcnow() - timedelta(days=90))
+
+        response = client.get(
+            f'{BASE_URL}/favorites/audits', query_string=dict(resourceId=7003))
+        assert [each['id'] for each in response.get_json()['data']] == recent
+
+        query = dict(resourceId=7003, archived='true', limit=2)
+        response = client.get(f'{BASE_URL}/favorites/audits', query_string=query)
+        data = response.get_json()
+        assert [each['id'] for each in data['data']] == [recent[0], old[1]]
+
+        query['cursor'] = data['meta']['nextCursor']
+        response = client.get(f'{BASE_URL}/favorites/audits', query_string=query)
+        data = response.get_json()
+        assert [each['id'] for each in data['data']] == [old[0]]
+        assert data['meta']['nextCursor'] is None
+
+    def test_audits_stream_reads_through_archive(self, client, init_db, archive_path):
+        """Test streamed audits continue into the archive as pages do
+
+            Args:
+                client(FlaskClient): fixture to get flask test client
+                init_db(SQLAlchemy): fixture to initialize the test database
+                archive_path (Path): Fixture to archive into a temporary directory
+        """
+        old = [each.id for each in create_audits(7004, days_ago=100, count=2)]
+        recent = [each.id for each in create_audits(7004, days_ago=1)]
+        Audit.archive().archive(datetime.utcnow() - timedelta(days=90))
+
+        for archived, expected in (('false', recent), ('true', recent + old[::-1])):
+            response = client.get(
+                f'{BASE_URL}/favorites/audits',
+                query_string=dict(resourceId=7004, archived=archived, stream=1))
+            rows = [json.loads(line) for line in response.data.decode().splitlines()]
+            assert [row['id'] for row in rows] == expected
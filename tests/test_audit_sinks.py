@@ -0,0 +1,156 @@
+"""Test audit sinks module"""
+import json
+
+import pytest
+from pytest import raises
+
+# Local Modules
+from api.audit_sinks import BufferedAuditSink, SyncAuditSink
+from api.database import db, unit_of_work
+from api.models import Audit, Category
+
+from tests.base import fake
+
+
+@pytest.fixture(scope='function')
+def buffered_sink(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'AUDIT_BUFFER_SIZE', 3)
+    monkeypatch.setitem(app.config, 'AUDIT_FLUSH_INTERVAL', 60)
+    monkeypatch.setitem(app.config, 'AUDIT_SPOOL_PATH', str(tmp_path / 'audit.spool'))
+
+    sink = BufferedAuditSink(app)
+    monkeypatch.setitem(app.extensions, 'audit_sink', sink)
+    yield sink
+    sink.close()
+
+
+def audits_of(category):
+    return Audit.filter(resource_id=category.id, resource_type='CATEGORY').all()
+
+
+class TestSyncAuditSink:
+    """Test audit entries saved with the audited change
+    """
+
+    def test_audit_saved_with_change(self, init_db, app):
+        """Test the default sink saves the audit in the same transaction
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                app (Flask): Fixture to get the flask app
+        """
+        assert isinstance(app.extensions['audit_sink'], SyncAuditSink)
+
+        category = Category(name=fake.alphanumeric(15)).save()
+
+        assert [each.action for each in audits_of(category)] == ['ADDED']
+
+
+class TestBufferedAuditSink:
+    """Test write-behind audit entries
+    """
+
+    def test_entries_inserted_on_flush(self, init_db, buffered_sink):
+        """Test committed entries are spooled and inserted once flushed
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                buffered_sink (BufferedAuditSink): Fixture to enable the buffered sink
+        """
+        category = Category(name=fake.alphanumeric(15)).save()
+
+        assert audits_of(category) == []
+        with open(buffered_sink.spool.name) as spool:
+            assert json.loads(spool.readline())['resource_id'] == category.id
+
+        buffered_sink.flush()
+
+        assert [each.action for each in audits_of(category)] == ['ADDED']
+
+    def test_full_buffer_is_flushed(self, init_db, buffered_sink):
+        """Test reaching the buffer size bulk inserts the entries
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                buffered_sink (BufferedAuditSink): Fixture to enable the buffered sink
+        """
+        category = Category(name=fake.alphanumeric(15)).save()
+        category.update(name=fake.alphanumeric(15))
+        category.update(name=fake.alphanumeric(15))
+
+        assert buffered_sink.buffer == []
+        assert len(audits_of(category)) == 3
+
+    def test_rolled_back_entries_are_dropped(self, init_db, buffered_sink):
+        """Test entries of a rolled back unit of work are never written
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                buffered_sink (BufferedAuditSink): Fixture to enable the buffered sink
+        """
+        name = fake.alphanumeric(15)
+
+        with raises(RuntimeError):
+            with unit_of_work():
+                Category(name=name).save()
+                raise RuntimeError('rolled back')
+
+        buffered_sink.flush()
+
+        assert Category.filter(name=name).first() is None
+        assert buffered_sink.buffer == []
+        assert 'audit_entries' not in db.session.info
+
+    def test_spooled_entries_are_recovered(self, init_db, app, buffered_sink):
+        """Test entries left in the spool by a stopped worker are inserted
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                app (Flask): Fixture to get the flask app
+                buffered_sink (BufferedAuditSink): Fixture to enable the buffered sink
+        """
+        category = Category(name=fake.alphanumeric(15)).save()
+        # simulate a crash: the buffered entry only survives in the spool
+        buffered_sink.buffer = []
+        buffered_sink.spool.close()
+
+        recovered = BufferedAuditSink(app)
+        recovered.close()
+
+        assert [each.action for each in audits_of(category)] == ['ADDED']
+
+    def test_failed_insert_inserted_once(self, init_db, app, buffered_sink, monkeypatch):
+        """Test entries of a failed insert are inserted once by the next flush
+        and never replayed again when the next sink starts
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                app (Flask): Fixture to get the flask app
+                buffered_sink (BufferedAuditSink): Fixture to enable the buffered sink
+                monkeypatch (MonkeyPatch): Fixture to fail the first insert
+        """
+        insert = buffered_sink.insert
+
+        def fail_once(entries):
+            monkeypatch.setattr(buffered_sink, 'insert', insert)
+            raise RuntimeError('insert failed')
+        monkeypatch.setattr(buffered_sink, 'insert', fail_once)
+
+        category = Category(name=fake.alphanumeric(15)).save()
+        category.update(name=fake.alphanumeric(15))
+        # the full buffer fails to flush without failing the committed update
+        category.update(name=fake.alphanumeric(15))
+
+        assert audits_of(category) == []
+        assert len(buffered_sink.segments) == 1
+        other = Category(name=fake.alphanumeric(15)).save()
+
+        buffered_sink.flush()
+        # stop the worker, nothing is left for the next sink to replay
+        buffered_sink.spool.close()
+        recovered = BufferedAuditSink(app)
+        recovered.close()
+
+        assert len(audits_of(category)) == 3
+        assert len(audits_of(other)) == 1
+        assert buffered_sink.segments == []
@@ -0,0 +1,137 @@
+"""Test response compression module"""
+import gzip
+
+import pytest
+from flask import Response
+
+# Local Modules
+from api import compression
+from api.compression import compress_response
+from api.models import Category, Favorite
+
+from tests.base import fake
+
+BASE_URL = '/api/v1'
+
+
+@pytest.fixture(scope='module')
+def large_category(app, init_db):
+    category = Category(name=fake.alphanumeric(15)).save()
+    for each in range(10):
+        Favorite(title=fake.alphanumeric(15), ranking=1, category_id=category.id,
+                 meta_data={'color': 'red', 'quantity': each}).save()
+    return category
+
+
+class TestCompression:
+    """Test responses compressed as negotiated with the client
+    """
+
+    def test_json_compressed_with_gzip(self, client, large_category):
+        """Test a large JSON response is gzip compressed with the same validators
+
+            Args:
+                client(FlaskClient): fixture to get flask test client
+                large_category (Category): Fixture to create a category with favorites
+        """
+        url = f'{BASE_URL}/categories/{large_category.id}/favorites'
+        plain = client.get(url)
+        response = client.get(url, headers={'Accept-Encoding': 'br;q=0.5, gzip'})
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert int(response.headers['Content-Length']) < len(plain.data)
+        assert gzip.decompress(response.data) == plain.data
+        assert response.headers['ETag'] == plain.headers['ETag']
+
+        response = client.get(url, headers={
+            'Accept-Encoding': 'gzip', 'If-None-Match': plain.headers['ETag']})
+        assert response.status_code == 304
+        assert response.data == b''
+        assert 'Content-Encoding' not in response.headers
+        assert 'Accept-Encoding' in response.headers['Vary']
+
+    def test_response_not_compressed(self, client, large_category, favorite):
+        """Test identity responses for small bodies and clients not accepting gzip
+
+            Args:
+                client(FlaskClient): fixture to get flask test client
+                large_category (Category): Fixture to create a category with favorites
+                favorite (Favorite): Fixture to create a new favorite
+        """
+        response = client.get(
+            f'{BASE_URL}/favorites/{favorite.id}', query_string=dict(fields='title'),
+            headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in response.headers
+        assert 'Accept-Encoding' in response.headers['Vary']
+
+        for accepted in ('identity', 'gzip;q=0'):
+            response = client.get(
+                f'{BASE_URL}/categories/{large_category.id}/favorites',
+                headers={'Accept-Encoding': accepted})
+            assert 'Content-Encoding' not in response.headers
+            assert response.get_json()['data']
+
+    def test_brotli_needs_the_brotli_package(self, client, large_category, monkeypatch):
+        """Test clients only accepting brotli get identity responses without it
+
+            Args:
+                client(FlaskClient): fixture to get flask test client
+                large_category (Category): Fixture to create a category with favorites
+                monkeypatch (MonkeyPatch): Fixture to remove the brotli encoder
+        """
+        monkeypatch.delitem(compression.ENCODERS, 'br', raising=False)
+        response = client.get(
+            f'{BASE_URL}/categories/{large_category.id}/favorites',
+            headers={'Accept-Encoding': 'br'})
+        assert 'Content-Encoding' not in response.headers
+
+    @pytest.mark.skipif(compression.brotli is None, reason='brotli is not installed')
+    def test_json_compressed_with_brotli(self, client, large_category):
+        """Test brotli is preferred when it is accepted as much as gzip
+
+            Args:
+                client(FlaskClient): fixture to get flask test client
+                large_category (Category): Fixture to create a category with favorites
+        """
+        url = f'{BASE_URL}/categories/{large_category.id}/favorites'
+        response = client.get(url, headers={'Accept-Encoding': 'gzip, br'})
+
+        assert response.headers['Content-Encoding'] == 'br'
+        assert compression.brotli.decompress(response.data) == client.get(url).data
+
+    def test_stream_compressed_as_sent(self, client, large_category, app, monkeypatch):
+        """Test NDJSON streams are compressed chunk by chunk
+
+            Args:
+                client(FlaskClient): fixture to get flask test client
+                large_category (Category): Fixture to create a category with favorites
+                app (Flask): Fixture to get the flask app
+                monkeypatch (MonkeyPatch): Fixture to stream small batches
+        """
+        monkeypatch.setitem(app.config, 'STREAM_BATCH_SIZE', 3)
+        url = f'{BASE_URL}/categories/{large_category.id}/favorites?stream=1'
+        plain = client.get(url)
+        response = client.get(url, headers={'Accept-Encoding': 'gzip'}, buffered=False)
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Content-Length' not in response.headers
+        chunks = list(response.response)
+        response.close()
+        assert len(chunks) > 1
+        assert gzip.decompress(b''.join(chunks)) == plain.data
+
+    def test_strong_etag_weakened(self, app):
+        """Test strong ETags are made weak on compressed responses
+
+            Args:
+                app (Flask): Fixture to get the flask app
+        """
+        response = Response('{"data": "%s"}' % ('x' * 1000), mimetype='application/json')
+        response.set_etag('abc')
+
+        with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+            response = compress_response(response, app.config)
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.headers['ETag'] == 'W/"abc"'
@@ -0,0 +1,204 @@
+"""Test idempotency keys module"""
+import json
+
+import pytest
+
+# Local Modules
+from api.idempotency import MemoryIdempotencyStore, SharedIdempotencyStore, request_fingerprint
+from api.messages import ERROR_MESSAGES
+from api.models import Audit, Category, Favorite
+
+from tests.base import fake
+
+BASE_URL = '/api/v1'
+
+
+class LocalStore(object):
+    """In-process stand-in for the Redis commands used by the shared store"""
+
+    def __init__(self):
+        self.values = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value.encode()
+        return True
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+
+@pytest.fixture(scope='function')
+def memory_store(app, monkeypatch):
+    store = MemoryIdempotencyStore(app)
+    monkeypatch.setitem(app.extensions, 'idempotency', store)
+    return store
+
+
+@pytest.fixture(scope='function')
+def shared_store(app, monkeypatch):
+    store = SharedIdempotencyStore(app, client=LocalStore())
+    monkeypatch.setitem(app.extensions, 'idempotency', store)
+    return store
+
+
+def post_favorite(client, key, payload):
+    return client.post(
+        f'{BASE_URL}/favorites', data=json.dumps(payload), content_type='application/json',
+        headers={'Idempotency-Key': key})
+
+
+class TestIdempotentRequests:
+    """Test write requests retried with an Idempotency-Key
+    """
+
+    @pytest.mark.parametrize('store', ['memory_store', 'shared_store'])
+    def test_retried_post_replayed(self, init_db, client, request, store):
+        """Test a retried POST is answered with the first response only
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                client(FlaskClient): fixture to get flask test client
+                request (FixtureRequest): Fixture to get the store fixture
+                store (str): Name of the fixture enabling the tested store
+        """
+        request.getfixturevalue(store)
+        category_id = Category(name=fake.alphanumeric(15)).save().id
+        payload = {'title': fake.alphanumeric(15), 'ranking': 1, 'categoryId': category_id}
+
+        first = post_favorite(client, 'retried-post', payload)
+        retry = post_favorite(client, 'retried-post', payload)
+
+        assert first.status_code == retry.status_code == 201
+        assert retry.get_json() == first.get_json()
+        assert retry.headers['Idempotent-Replayed'] == 'true'
+        assert 'Idempotent-Replayed' not in first.headers
+        assert Favorite.filter(category_id=category_id).count() == 1
+        assert Audit.filter(
+            resource_type='FAVORITE', resource_id=first.get_json()['data']['id']).count() == 1
+
+    def test_retried_put_and_delete_replayed(self, init_db, client, memory_store):
+        """Test PUT responses built by jsonify and DELETE responses are replayed
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                client(FlaskClient): fixture to get flask test client
+                memory_store (MemoryIdempotencyStore): Fixture to enable the memory store
+        """
+        category = Category(name=fake.alphanumeric(15)).save()
+        url = f'{BASE_URL}/categories/{category.id}'
+        payload = json.dumps({'name': fake.alphanumeric(15)})
+
+        responses = [
+            client.put(url, data=payload, content_type='application/json',
+                       headers={'Idempotency-Key': 'retried-put'})
+            for each in range(2)
+        ]
+        assert responses[1].data == responses[0].data
+        assert responses[1].headers['Content-Type'] == 'application/json'
+        assert Audit.filter(resource_type='CATEGORY', resource_id=category.id,
+                            action='UPDATED').count() == 1
+
+        responses = [
+            client.delete(url, headers={'Idempotency-Key': 'retried-delete'})
+            for each in range(2)
+        ]
+        assert [each.status_code for each in responses] == [200, 200]
+        assert responses[1].headers['Idempotent-Replayed'] == 'true'
+
+    def test_key_reused_for_other_request_fails(self, init_db, client, memory_store):
+        """Test a key is bound to the method, path and body it was first sent with
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                client(FlaskClient): fixture to get flask test client
+                memory_store (MemoryIdempotencyStore): Fixture to enable the memory store
+        """
+        category_id = Category(name=fake.alphanumeric(15)).save().id
+        payload = {'title': fake.alphanumeric(15), 'ranking': 1, 'categoryId': category_id}
+        post_favorite(client, 'reused', payload)
+
+        response = post_favorite(client, 'reused', dict(payload, title=fake.alphanumeric(15)))
+
+        assert response.status_code == 422
+        assert response.get_json()['message'] == ERROR_MESSAGES['IDEMPOTENCY_KEY_REUSED']
+        assert Favorite.filter(category_id=category_id).count() == 1
+
+    def test_key_in_progress_fails(self, app, init_db, client, memory_store):
+        """Test a retry arriving while the first request runs is rejected
+
+            Args:
+                app (Flask): Fixture to get the flask app
+                init_db(SQLAlchemy): fixture to initialize the test database
+                client(FlaskClient): fixture to get flask test client
+                memory_store (MemoryIdempotencyStore): Fixture to enable the memory store
+        """
+        category_id = Category(name=fake.alphanumeric(15)).save().id
+        payload = json.dumps({'title': fake.alphanumeric(15), 'ranking': 1, 'categoryId': category_id})
+
+        with app.test_request_context(
+                f'{BASE_URL}/favorites', method='POST', data=payload,
+                content_type='application/json'):
+            assert memory_store.reserve('running', request_fingerprint()) is None
+
+        response = post_favorite(client, 'running', json.loads(payload))
+
+        assert response.status_code == 409
+        assert response.get_json()['message'] == ERROR_MESSAGES['IDEMPOTENCY_IN_PROGRESS']
+        assert Favorite.filter(category_id=category_id).count() == 0
+
+    def test_failed_request_not_stored(self, init_db, client, memory_store):
+        """Test the key of a failed request is released for its retries
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                client(FlaskClient): fixture to get flask test client
+                memory_store (MemoryIdempotencyStore): Fixture to enable the memory store
+        """
+        category_id = Category(name=fake.alphanumeric(15)).save().id
+        title = Favorite(title=fake.alphanumeric(15), ranking=1, category_id=category_id).save().title
+        payload = {'title': title, 'ranking': 1, 'categoryId': category_id}
+
+        assert post_favorite(client, 'failed', payload).status_code == 409
+        assert memory_store.entries == {}
+
+        Favorite.query.filter_by(title=title).one().delete()
+        assert post_favorite(client, 'failed', payload).status_code == 201
+
+    def test_invalid_key_fails(self, init_db, client, memory_store):
+        """Test empty and overlong keys are rejected
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                client(FlaskClient): fixture to get flask test client
+                memory_store (MemoryIdempotencyStore): Fixture to enable the memory store
+        """
+        for key in ('', 'k' * 256):
+            response = client.delete(f'{BASE_URL}/favorites/1', headers={'Idempotency-Key': key})
+            assert response.status_code == 400
+
+
+class TestMemoryIdempotencyStore:
+    """Test the in-process idempotency store
+    """
+
+    def test_entries_expire_and_evicted(self, app, memory_store):
+        """Test entries are dropped after their TTL or beyond IDEMPOTENCY_SIZE
+
+            Args:
+                app (Flask): Fixture to get the flask app
+                memory_store (MemoryIdempotencyStore): Fixture to enable the memory store
+        """
+        memory_store.lock_ttl = 0
+        assert memory_store.reserve('a', 'fingerprint') is None
+        assert memory_store.reserve('a', 'fingerprint') is None
+
+        memory_store.size = 2
+        for key in 'abc':
+            memory_store.store(key, 'fingerprint', {})
+        assert memory_store.get('a') is None
+        assert memory_store.reserve('c', 'fingerprint') == {'fingerprint': 'fingerprint', 'response': {}}
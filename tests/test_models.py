@@ -1,10 +1,12 @@
 """Test model user module"""
 from pytest import raises
+from sqlalchemy import event
 
 # Local Modules
-from api.models import Category, Audit, Favorite
+from api.database import db
+from api.models import Category, Audit, Favorite, ranking_engines
 
-from tests.base import fake
+from tests.base import fake, count_queries
 
 class TestCategoryModel:
     """Test category model
@@ -241,4 +243,143 @@ class TestFavoriteModel:
         with raises(NotImplementedError) as error:
             favorite.get_child_relationships()
         
-        assert  str(error.value) == "The get_relationships method must be overridden in all child model classes"
\ No newline at end of file
+        assert  str(error.value) == "The get_relationships method must be overridden in all child model classes"
+
+
+class TestUnitOfWork:
+    """Test model writes, reranks and audits share one transaction
+    """
+
+    def test_favorite_save_commits_once(self, init_db, category2):
+        """Test saving a favorite with its rerank and audit commits once
+
+        Args:
+            init_db (SQLAlchemy): fixture to initialize the test database
+            category2 (Category): Fixture to create a new category
+        """
+        commits = []
+        listener = lambda session: commits.append(session)
+        event.listen(db.session, 'after_commit', listener)
+        try:
+            Favorite(
+                title=fake.alphanumeric(15), ranking=1, category_id=category2.id).save()
+        finally:
+            event.remove(db.session, 'after_commit', listener)
+
+        assert len(commits) == 1
+
+    def test_favorite_save_is_atomic(self, init_db, category2, monkeypatch):
+        """Test a failing audit rolls back the favorite and its rerank
+
+        Args:
+            init_db (SQLAlchemy): fixture to initialize the test database
+            category2 (Category): Fixture to create a new category
+            monkeypatch (MonkeyPatch): Fixture to patch the audit log
+        """
+        existing = Favorite(
+            title=fake.alphanumeric(15), ranking=1, category_id=category2.id).save()
+        title = fake.alphanumeric(15)
+
+        def fail(*args):
+            raise RuntimeError('audit failed')
+        monkeypatch.setattr(Audit, 'log', fail)
+
+        with raises(RuntimeError):
+            Favorite(title=title, ranking=1, category_id=category2.id).save()
+
+        assert Favorite.filter(title=title).first() is None
+        assert Favorite.get(existing.id).ranking == 1
+
+
+class TestChangeAwareUpdate:
+    """Test updates only write, rerank and audit the fields that changed
+    """
+
+    def test_unchanged_update_writes_nothing(self, init_db, category2):
+        """Test updating a favorite and a category with their own values
+
+        Args:
+            init_db (SQLAlchemy): fixture to initialize the test database
+            category2 (Category): Fixture to create a new category
+        """
+        favorite = Favorite(
+            title=fake.alphanumeric(15), ranking=1, category_id=category2.id).save()
+        audits = Audit.query.count()
+
+        with count_queries(db.engine) as statements:
+            favorite.update(title=favorite.title, ranking=1, category_id=category2.id)
+            category2.update(name=category2.name)
+
+        assert not [each for each in statements if not each.startswith('SELECT')]
+        assert Audit.query.count() == audits
+
+    def test_field_update_skips_rerank(self, init_db, category2, monkeypatch):
+        """Test editing other fields than the ranking never runs the ranking engine
+
+        Args:
+            init_db (SQLAlchemy): fixture to initialize the test database
+            category2 (Category): Fixture to create a new category
+            monkeypatch (MonkeyPatch): Fixture to patch the ranking engine
+        """
+        favorite = Favorite(
+            title=fake.alphanumeric(15), ranking=1, category_id=category2.id).save()
+
+        def fail(*args):
+            raise RuntimeError('reranked')
+        monkeypatch.setattr(ranking_engines['dense'], 'move', fail)
+
+        description = fake.alphanumeric(100)
+        favorite.update(description=description, meta_data={'color': 'red'}, ranking=1)
+
+        assert Favorite.get(favorite.id).description == description
+        audit = Audit.filter(resource_type='FAVORITE', resource_id=favorite.id, action='UPDATED').one()
+        assert audit.activity == \
+            f'Favorite with id {favorite.id} was updated with new changes to description, meta_data'
+
+    def test_sparse_ranking_compared_to_position(self, app, init_db, category2, monkeypatch):
+        """Test a sparse favorite given its own position keeps its key
+
+        Args:
+            app (Flask): Fixture to get the flask app
+            init_db (SQLAlchemy): fixture to initialize the test database
+            category2 (Category): Fixture to create a new category
+            monkeypatch (MonkeyPatch): Fixture to switch to the sparse ranking mode
+        """
+        monkeypatch.setitem(app.config, 'RANKING_MODE', 'sparse')
+        category = Category(name=fake.alphanumeric(15)).save()
+        first, second = [
+            Favorite(title=fake.alphanumeric(15), ranking=each, category_id=category.id).save()
+            for each in (1, 2)
+        ]
+        key = second.ranking
+
+        second.update(ranking=2, title=fake.alphanumeric(15))
+        assert Favorite.get(second.id).ranking == key
+
+        second.update(ranking=1)
+        assert Favorite.get(second.id).position == 1
+
+    def test_out_of_range_ranking_compared_to_last_position(self, init_db, monkeypatch):
+        """Test a ranking past the end given to the last favorite is no change
+
+        Args:
+            init_db (SQLAlchemy): fixture to initialize the test database
+            monkeypatch (MonkeyPatch): Fixture to patch the ranking engine
+        """
+        category = Category(name=fake.alphanumeric(15)).save()
+        favorites = [
+            Favorite(title=fake.alphanumeric(15), ranking=each, category_id=category.id).save()
+            for each in range(1, 6)
+        ]
+        audits = Audit.query.count()
+
+        def fail(*args):
+            raise RuntimeError('reranked')
+        with monkeypatch.context() as patched:
+            patched.setattr(ranking_engines['dense'], 'move', fail)
+            favorites[4].update(ranking=999)
+        assert Audit.query.count() == audits
+
+        favorites[1].update(ranking=999)
+        assert Favorite.get(favorites[1].id).ranking == 5
+        assert Favorite.get(favorites[4].id).ranking == 4
@@ -0,0 +1,329 @@
+"""Test favorites ranking engine module"""
+import pytest
+from sqlalchemy.dialects import mysql, postgresql
+
+# Local Modules
+from api.database import db
+from api.models import Category, Favorite, ranking_engines
+
+from tests.base import fake
+
+
+def create_favorite(category, ranking):
+    params = {
+        'title' : fake.alphanumeric(15),
+        'description' : fake.alphanumeric(200),
+        'ranking' : ranking,
+        'category_id' : category.id
+    }
+    return Favorite(**params).save()
+
+
+def ordered_titles(category):
+    favorites = category.favorites.order_by(Favorite.ranking).all()
+    assert [each.ranking for each in favorites] == list(range(1, len(favorites) + 1))
+    return [each.title for each in favorites]
+
+
+def ordered_keys(category):
+    favorites = category.favorites.order_by(Favorite.ranking, Favorite.id).all()
+    Favorite.load_positions(favorites)
+    assert [each.position for each in favorites] == list(range(1, len(favorites) + 1))
+    return [(each.title, each.ranking) for each in favorites]
+
+
+@pytest.fixture(scope='function')
+def sparse_mode(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'RANKING_MODE', 'sparse')
+
+
+@pytest.fixture(scope='function')
+def new_category(app):
+    return Category(name=fake.alphanumeric()).save()
+
+
+class TestRankingEngine:
+    """Test ranking engine
+    """
+
+    def test_insert_shifts_favorites_below(self, init_db, category):
+        """Test inserting favorites keeps rankings dense
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                category (Category): Fixture to create a new category
+        """
+        first = create_favorite(category, 1)
+        second = create_favorite(category, 2)
+        third = create_favorite(category, 1)
+
+        assert ordered_titles(category) == [third.title, first.title, second.title]
+
+    def test_move_shifts_favorites_in_range(self, init_db, category1):
+        """Test moving a favorite up and down a category
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                category1 (Category): Fixture to create a new category
+        """
+        favorites = [create_favorite(category1, each) for each in range(1, 5)]
+        titles = [each.title for each in favorites]
+
+        favorites[3].update(ranking=1)
+        assert ordered_titles(category1) == [titles[3]] + titles[:3]
+
+        favorites[3].update(ranking=4)
+        assert ordered_titles(category1) == titles
+
+    def test_move_to_another_category(self, init_db, category2, category3):
+        """Test moving a favorite between categories
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                category2 (Category): Fixture to create a new category
+                category3 (Category): Fixture to create a new category
+        """
+        first, second = create_favorite(category2, 1), create_favorite(category2, 2)
+        other = create_favorite(category3, 1)
+
+        first.update(category_id=category3.id, ranking=1)
+
+        assert ordered_titles(category2) == [second.title]
+        assert ordered_titles(category3) == [first.title, other.title]
+
+    def test_remove_closes_gap(self, init_db, category4):
+        """Test deleting a favorite keeps rankings dense
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                category4 (Category): Fixture to create a new category
+        """
+        favorites = [create_favorite(category4, each) for each in range(1, 4)]
+
+        favorites[0].delete()
+
+        assert ordered_titles(category4) == [each.title for each in favorites[1:]]
+
+
+    @pytest.mark.parametrize('ranking, position', [(0, 1), (-3, 1), (9, 5)])
+    def test_out_of_range_rankings_clamped(self, init_db, new_category, ranking, position):
+        """Test rankings below 1 or past the last favorite keep rankings dense
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                new_category (Category): Fixture to create a new category
+                ranking (int): Requested ranking, out of the 1..n+1 range
+                position (int): Position the favorite is expected at
+        """
+        favorites = [create_favorite(new_category, each) for each in range(1, 5)]
+        titles = [each.title for each in favorites]
+
+        inserted = create_favorite(new_category, ranking)
+        expected = titles[:position - 1] + [inserted.title] + titles[position - 1:]
+        assert ordered_titles(new_category) == expected
+        assert inserted.ranking == position
+
+        favorites[1].update(ranking=ranking)
+        moved = [each for each in expected if each != titles[1]]
+        moved.insert(position - 1, titles[1])
+        assert ordered_titles(new_category) == moved
+
+
+class TestRebalance:
+    """Test full category reranks
+    """
+
+    @pytest.mark.parametrize('method', ['rebalance', 'rebalance_portable'])
+    def test_rebalance_compacts_rankings(self, init_db, new_category, method):
+        """Test rebalancing renumbers a category with gaps in its rankings
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                new_category (Category): Fixture to create a new category
+                method (str): Name of the rebalance method under test
+        """
+        favorites = [create_favorite(new_category, each) for each in range(1, 4)]
+        table = Favorite.__table__
+        db.session.execute(
+            table.update().where(table.c.category_id == new_category.id)
+            .values(ranking=table.c.ranking * 7))
+        db.session.commit()
+
+        getattr(ranking_engines['dense'], method)(new_category.id)
+        db.session.commit()
+
+        assert ordered_titles(new_category) == [each.title for each in favorites]
+
+    def test_rerank_statement_requires_window_functions(self):
+        """Test servers without window functions use the portable rebalance
+        """
+        class OldMySQLDialect(mysql.dialect):
+            server_version_info = (5, 7, 25)
+
+        assert ranking_engines['dense'].rerank_statement(OldMySQLDialect()) is None
+        assert ranking_engines['dense'].rerank_statement(postgresql.dialect()) is not None
+
+
+class TestSparseRankingEngine:
+    """Test sparse ranking engine
+    """
+
+    def test_insert_only_writes_new_favorite(self, init_db, sparse_mode, new_category):
+        """Test inserting favorites leaves the keys of the others untouched
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                sparse_mode (None): Fixture to switch to the sparse ranking mode
+                new_category (Category): Fixture to create a new category
+        """
+        first = create_favorite(new_category, 1)
+        second = create_favorite(new_category, 2)
+        before = ordered_keys(new_category)
+
+        third = create_favorite(new_category, 2)
+
+        after = ordered_keys(new_category)
+        assert [title for title, key in after] == [first.title, third.title, second.title]
+        assert set(before) < set(after)
+        assert third.position == 2
+
+    def test_move_within_category(self, init_db, sparse_mode, new_category):
+        """Test moving a favorite only rewrites its own key
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                sparse_mode (None): Fixture to switch to the sparse ranking mode
+                new_category (Category): Fixture to create a new category
+        """
+        favorites = [create_favorite(new_category, each) for each in range(1, 5)]
+        titles = [each.title for each in favorites]
+
+        favorites[0].update(ranking=3)
+
+        after = ordered_keys(new_category)
+        assert [title for title, key in after] == [titles[1], titles[2], titles[0], titles[3]]
+        assert favorites[0].position == 3
+
+    def test_move_to_category_keeps_position(self, init_db, sparse_mode, new_category):
+        """Test a favorite moved without a ranking keeps its position, not its key
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                sparse_mode (None): Fixture to switch to the sparse ranking mode
+                new_category (Category): Fixture to create a new category
+        """
+        other = Category(name=fake.alphanumeric(14)).save()
+        moved = [create_favorite(new_category, each) for each in range(1, 4)][0]
+        titles = [create_favorite(other, each).title for each in range(1, 4)]
+
+        Favorite.get(moved.id).update(category_id=other.id)
+
+        after = ordered_keys(other)
+        assert [title for title, key in after] == [moved.title] + titles
+        assert Favorite.get(moved.id).position == 1
+
+    def test_rebalance_when_keys_run_out(self, init_db, sparse_mode, new_category):
+        """Test a category is rebalanced once neighbouring keys are exhausted
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                sparse_mode (None): Fixture to switch to the sparse ranking mode
+                new_category (Category): Fixture to create a new category
+        """
+        first = create_favorite(new_category, 1)
+        last = create_favorite(new_category, 2)
+        inserted = [create_favorite(new_category, 2) for each in range(15)]
+
+        titles = [title for title, key in ordered_keys(new_category)]
+        assert titles == [first.title] + [each.title for each in reversed(inserted)] + [last.title]
+
+    def test_favorites_list_dumps_positions(self, client, init_db, sparse_mode, new_category):
+        """Test list endpoints expose dense rankings
+
+            Args:
+                client(FlaskClient): fixture to get flask test client
+                init_db(SQLAlchemy): fixture to initialize the test database
+                sparse_mode (None): Fixture to switch to the sparse ranking mode
+                new_category (Category): Fixture to create a new category
+        """
+        for each in (1, 1, 2):
+            create_favorite(new_category, each)
+
+        response = client.get(f'/api/v1/categories/{new_category.id}/favorites')
+
+        data = response.get_json()['data']
+        assert sorted(each['ranking'] for each in data) == [1, 2, 3]
+
+    def test_positions_numbered_per_category(self, init_db, sparse_mode, new_category):
+        """Test the ROW_NUMBER() positions match the portable count in each category
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                sparse_mode (None): Fixture to switch to the sparse ranking mode
+                new_category (Category): Fixture to create a new category
+        """
+        other = Category(name=fake.alphanumeric(14)).save()
+        favorites = [create_favorite(category, ranking)
+                     for category in (new_category, other) for ranking in (1, 1, 3, 2)]
+        engine = ranking_engines['sparse']
+        requested = favorites[1:6]
+
+        positions = engine.positions(requested)
+
+        assert positions == engine.positions_portable([each.id for each in requested])
+        assert [positions[each.id] for each in requested] == [1, 4, 2, 3, 1]
+
+
+class TestRankingLocks:
+    """Test per category locking of rank mutations
+    """
+
+    @pytest.mark.parametrize('dialect', [mysql.dialect(), postgresql.dialect()])
+    def test_lock_statement_locks_categories_in_id_order(self, dialect):
+        """Test categories are row locked in a deterministic order
+
+            Args:
+                dialect (Dialect): Database dialect compiling the statement
+        """
+        statement = ranking_engines['dense'].lock_statement([7, 3, 7], dialect.name)
+        compiled = statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True})
+
+        assert str(compiled).endswith('FOR UPDATE')
+        assert '(3, 7)' in str(compiled)
+        assert 'ORDER BY categories.id' in str(compiled)
+
+
+class TestBulkRanking:
+    """Test favorites created in bulk are ranked once per category
+    """
+
+    @pytest.mark.parametrize('mode', ['dense', 'sparse'])
+    def test_bulk_create_ranks_as_sequential_creates(self, init_db, app, monkeypatch, mode):
+        """Test a batch is ordered as if its favorites were created one by one
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                app (Flask): Fixture to get the flask app
+                monkeypatch (MonkeyPatch): Fixture to set the ranking mode
+                mode (str): Ranking mode under test
+        """
+        monkeypatch.setitem(app.config, 'RANKING_MODE', mode)
+        sequential, bulk = [Category(name=fake.alphanumeric()).save() for each in range(2)]
+        rankings = [1, 4, 2, 1, 3]
+
+        for category in (sequential, bulk):
+            for ranking in (1, 2):
+                create_favorite(category, ranking)
+        for ranking in rankings:
+            create_favorite(sequential, ranking)
+        Favorite.bulk_create([
+            dict(title=fake.alphanumeric(15), ranking=ranking, category_id=bulk.id)
+            for ranking in rankings
+        ])
+
+        def created_order(category):
+            titles = [title for title, key in ordered_keys(category)]
+            created = [each.title for each in category.favorites.order_by(Favorite.id)]
+            return [created.index(title) for title in titles]
+
+        assert created_order(bulk) == created_order(sequential)
@@ -0,0 +1,196 @@
+"""Test response cache module"""
+import pytest
+
+# Local Modules
+from api.database import db, unit_of_work
+from api.models import Category, Favorite
+from api.response_cache import MemoryResponseCache, SharedResponseCache
+
+from tests.base import fake, count_queries
+
+BASE_URL = '/api/v1'
+
+
+class LocalStore(object):
+    """In-process stand-in for the Redis commands used by the shared cache"""
+
+    def __init__(self):
+        self.values = {}
+
+    def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value.encode()
+
+    def incr(self, key):
+        self.values[key] = str(int(self.values.get(key, 0)) + 1).encode()
+        return int(self.values[key])
+
+
+@pytest.fixture(scope='function')
+def memory_cache(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'RESPONSE_CACHE_SIZE', 2)
+    monkeypatch.setitem(app.config, 'RESPONSE_CACHE_TTL', 60)
+
+    cache = MemoryResponseCache(app)
+    monkeypatch.setitem(app.extensions, 'response_cache', cache)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture(scope='function')
+def store():
+    return LocalStore()
+
+
+@pytest.fixture(scope='function')
+def shared_cache(app, store, monkeypatch):
+    cache = SharedResponseCache(app, client=store)
+    monkeypatch.setitem(app.extensions, 'response_cache', cache)
+    yield cache
+    cache.close()
+
+
+def category_with_favorite():
+    category = Category(name=fake.alphanumeric(15)).save()
+    Favorite(title=fake.alphanumeric(15), ranking=1, category_id=category.id).save()
+    return category
+
+
+class TestMemoryResponseCache:
+    """Test the in-process LRU response cache
+    """
+
+    def test_get_served_from_cache(self, init_db, client, memory_cache):
+        """Test a repeated GET is answered without a query
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                client(FlaskClient): fixture to get flask test client
+                memory_cache (MemoryResponseCache): Fixture to enable the memory cache
+        """
+        category = category_with_favorite()
+        url = f'{BASE_URL}/categories/{category.id}/favorites'
+
+        first = client.get(url)
+        with count_queries(db.engine) as statements:
+            second = client.get(url)
+
+        assert statements == []
+        assert second.get_json() == first.get_json()
+        assert second.headers['ETag'] == first.headers['ETag']
+        assert memory_cache.stats() == {'hits': 1, 'misses': 1}
+
+        response = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+        assert response.status_code == 304
+        assert memory_cache.stats() == {'hits': 2, 'misses': 1}
+
+    def test_write_invalidates_its_tags_only(self, init_db, client, memory_cache):
+        """Test a write to a category invalidates its favorites and the index
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                client(FlaskClient): fixture to get flask test client
+                memory_cache (MemoryResponseCache): Fixture to enable the memory cache
+        """
+        category, other = category_with_favorite(), category_with_favorite()
+        urls = [
+            f'{BASE_URL}/categories',
+            f'{BASE_URL}/categories/{category.id}/favorites',
+            f'{BASE_URL}/categories/{other.id}/favorites',
+        ]
+        memory_cache.size = 10
+        for url in urls:
+            client.get(url)
+
+        Favorite(title=fake.alphanumeric(15), ranking=1, category_id=category.id).save()
+
+        for url in urls:
+            client.get(url)
+        assert memory_cache.stats() == {'hits': 1, 'misses': 5}
+        response = client.get(urls[1])
+        assert len(response.get_json()['data']) == 2
+
+    def test_rolled_back_write_keeps_cache(self, init_db, client, memory_cache):
+        """Test tags are only invalidated once the write commits
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                client(FlaskClient): fixture to get flask test client
+                memory_cache (MemoryResponseCache): Fixture to enable the memory cache
+        """
+        category = category_with_favorite()
+        url = f'{BASE_URL}/categories/{category.id}/favorites'
+        client.get(url)
+
+        with pytest.raises(RuntimeError):
+            with unit_of_work():
+                category.update(name=fake.alphanumeric(15))
+                raise RuntimeError()
+
+        client.get(url)
+        assert memory_cache.stats() == {'hits': 1, 'misses': 1}
+
+    def test_least_recently_used_evicted(self, app, memory_cache):
+        """Test the cache holds at most RESPONSE_CACHE_SIZE entries
+
+            Args:
+                app (Flask): Fixture to get the flask app
+                memory_cache (MemoryResponseCache): Fixture to enable the memory cache
+        """
+        for key in ('a', 'b'):
+            memory_cache.store(key, {}, [key, 200, {}])
+        memory_cache.lookup('a', [])
+        memory_cache.store('c', {}, ['c', 200, {}])
+
+        assert [memory_cache.lookup(key, [])[0] for key in 'abc'] == [
+            ['a', 200, {}], None, ['c', 200, {}]]
+
+    def test_expired_entries_missed(self, app, memory_cache):
+        """Test entries are dropped after RESPONSE_CACHE_TTL seconds
+
+            Args:
+                app (Flask): Fixture to get the flask app
+                memory_cache (MemoryResponseCache): Fixture to enable the memory cache
+        """
+        memory_cache.ttl = 0
+        memory_cache.store('a', {}, ['a', 200, {}])
+
+        assert memory_cache.lookup('a', [])[0] is None
+        assert memory_cache.entries == {}
+
+
+class TestSharedResponseCache:
+    """Test the response cache shared by the workers
+    """
+
+    def test_write_invalidates_every_worker(
+            self, init_db, client, app, store, shared_cache, monkeypatch):
+        """Test a write committed by one worker invalidates the cache of another
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                client(FlaskClient): fixture to get flask test client
+                app (Flask): Fixture to get the flask app
+                store (LocalStore): Fixture standing in for the shared store
+                shared_cache (SharedResponseCache): Fixture to enable the shared cache
+                monkeypatch (MonkeyPatch): Fixture to switch the worker's cache
+        """
+        category = category_with_favorite()
+        url = f'{BASE_URL}/categories/{category.id}/favorites'
+        client.get(url)
+
+        other_worker = SharedResponseCache(app, client=store)
+        monkeypatch.setitem(app.extensions, 'response_cache', other_worker)
+        try:
+            client.get(url)
+            assert other_worker.stats() == {'hits': 1, 'misses': 0}
+            category.update(name=fake.alphanumeric(15))
+        finally:
+            other_worker.close()
+
+        monkeypatch.setitem(app.extensions, 'response_cache', shared_cache)
+        response = client.get(url)
+        assert shared_cache.stats() == {'hits': 0, 'misses': 2}
+        assert response.get_json()['data'][0]['category']['name'] == category.name
@@ -0,0 +1,81 @@
+"""Test precompiled serializers module"""
+from flask import json
+
+# Local Modules
+from api.models import Audit, Category, Favorite
+from api.schemas import AuditSchema, CategorySchema, FavoriteSchema
+from api.serializers import serializer, json_encoder
+
+from tests.base import fake
+
+
+def dumped_by_both(schema_class, rows, **options):
+    """ Return the dumps of the marshmallow schema and of its serializer """
+    expected = schema_class(many=True, **options).dump(rows).data
+    return expected, serializer(schema_class, **options).dump(rows, many=True)
+
+
+class TestSerializer:
+    """Test serializers dump what the marshmallow schemas dump
+    """
+
+    def test_favorites_dumped_as_schema(self, init_db, favorites):
+        """Test favorites, with their nested category, all fields or a few
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                favorites (list): Fixture to create favorites of a category
+        """
+        bare = Favorite(
+            title=fake.alphanumeric(15), ranking=1, category_id=favorites[0].category_id).save()
+        rows = Favorite.filter(category_id=bare.category_id).all()
+
+        for only in (None, ['id', 'title', 'meta_data'], ['id', 'category', 'ranking']):
+            expected, dumped = dumped_by_both(FavoriteSchema, rows, only=only)
+            assert dumped == expected
+            assert json.dumps(dumped) == json.dumps(expected)
+
+        assert serializer(FavoriteSchema).dump(bare) == FavoriteSchema().dump(bare).data
+
+    def test_categories_dumped_as_schema(self, init_db, category_with_favorites):
+        """Test categories with their favorites count and optional rankings
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                category_with_favorites (Category): Fixture to create a category with favorites
+        """
+        for include in ((), ['rankings']):
+            rows = list(Category.with_favorites_count())
+            expected, dumped = dumped_by_both(CategorySchema, rows, include=include)
+            assert json.dumps(dumped) == json.dumps(expected)
+
+    def test_audits_dumped_as_schema(self, init_db, category):
+        """Test audits, including never modified ones
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+                category (Category): Fixture to create a new category
+        """
+        expected, dumped = dumped_by_both(AuditSchema, Audit.query.all())
+        assert dumped and json.dumps(dumped) == json.dumps(expected)
+
+    def test_serializer_compiled_once(self, init_db):
+        """Test the serializer of the same options is reused
+
+            Args:
+                init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        assert serializer(FavoriteSchema, only=['id', 'title']) is \
+            serializer(FavoriteSchema, only=['id', 'title'])
+        assert serializer(FavoriteSchema, only=['id', 'title']) is not \
+            serializer(FavoriteSchema, only=['title', 'id'])
+
+    def test_json_encoder_matches_flask(self, app, request_ctx):
+        """Test the reused encoder writes the bytes of flask.json.dumps
+
+            Args:
+                app (Flask): Fixture to get the flask app
+                request_ctx (RequestContext): Fixture to push a request context
+        """
+        row = {'title': 'café </b>', 'metaData': {'b': 1, 'a': [1.5, None]}, 'id': 1}
+        assert json_encoder().encode(row) == json.dumps(row)
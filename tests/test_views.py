@@ -1,14 +1,18 @@
 """
 Module of tests for company endpoints
 """
+from datetime import datetime, timedelta
+
 from flask import json
 
 # app config
 from config import AppConfig
 
-from tests.base import fake
+from tests.base import fake, count_queries
 
 from api.messages import (ERROR_MESSAGES, SUCCESS_MESSAGES)
+from api.database import db
+from api.models import Audit, Category, Favorite
 
 BASE_URL = AppConfig.API_BASE_URL_V1
 
@@ -33,6 +37,54 @@ class TestCategoryResource:
         assert data['message'] == SUCCESS_MESSAGES['FETCHED'].format('Categories')
         assert len(data['data']) > 0
 
+    def test_get_all_categories_includes_rankings_when_asked_succeeds(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        category = Category(name=fake.alphanumeric(14)).save()
+        for each in range(12):
+            Favorite(title=fake.alphanumeric(15), ranking=1, category_id=category.id).save()
+
+        response = client.get(f'{BASE_URL}/categories')
+        assert all('rankings' not in each for each in response.get_json()['data'])
+
+        response = client.get(f'{BASE_URL}/categories', query_string=dict(include='rankings'))
+        listed = next(each for each in response.get_json()['data'] if each['id'] == category.id)
+        assert [each['name'] for each in listed['rankings']][:4] == ['1st', '2nd', '3rd', '4th']
+        assert listed['rankings'][-2:] == [dict(id=12, name='12th'), dict(id=13, name='13th')]
+
+    def test_get_all_categories_query_count_is_constant(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        def list_categories():
+            with count_queries(db.engine) as statements:
+                response = client.get(
+                    f'{BASE_URL}/categories', query_string=dict(include='rankings'))
+            assert response.status_code == 200
+            return response.get_json()['data'], len(statements)
+
+        category = Category(name=fake.alphanumeric(14)).save()
+        Favorite(title=fake.alphanumeric(15), ranking=1, category_id=category.id).save()
+        data, queries = list_categories()
+
+        for each in range(5):
+            Category(name=fake.alphanumeric(14)).save()
+        more_data, more_queries = list_categories()
+
+        assert len(more_data) == len(data) + 5
+        # the validators of the list, then the categories with their counts
+        assert more_queries == queries == 2
+        listed = next(each for each in more_data if each['id'] == category.id)
+        assert listed['favoritesCount'] == 1
+        assert len(listed['rankings']) == 2
+
 
     def test_create_category_with_valid_data_succeeds(
             self, client, init_db):
@@ -137,8 +189,9 @@ class TestCategoryResource:
             category_with_favorites (Category): Fixture to create a new category with favorites
         """
 
-        response = client.get(
-            f'{BASE_URL}/categories/{category_with_favorites.id}/favorites')
+        url = f'{BASE_URL}/categories/{category_with_favorites.id}/favorites'
+        with count_queries(db.engine) as statements:
+            response = client.get(url)
 
         data = json.loads(response.data.decode())
         
@@ -146,6 +199,10 @@ class TestCategoryResource:
         assert data['status'] == 'success'
         assert data['message'] == SUCCESS_MESSAGES['FETCHED'].format('Favorites')
         assert len(data['data']) > 0
+        assert all(each['category']['id'] == category_with_favorites.id for each in data['data'])
+        # the validators, the category and its favorites, the nested category
+        # is not loaded again
+        assert len(statements) == 3
  
 
 class TestSingleCategoryResource:
@@ -277,6 +334,108 @@ class TestSingleCategoryResource:
         assert response_json['status'] == 'error'
         assert response_json['message'] == ERROR_MESSAGES['DELETING_RELATED_OBJECTS'].format('Category', 'Favorites')
 
+class TestCategoryFavoritesOrderResource:
+
+    def test_reorder_category_favorites_succeeds(
+            self, client, init_db, category_with_favorites):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+            category_with_favorites (Category): Fixture to create a new category with favorites
+        """
+        favorite_ids = [
+            favorite.id for favorite in category_with_favorites.favorites.order_by('ranking')
+        ][::-1]
+
+        response = client.patch(
+            f'{BASE_URL}/categories/{category_with_favorites.id}/favorites/order',
+            data=json.dumps({'favoriteIds': favorite_ids}),
+            content_type='application/json')
+
+        response_json = json.loads(response.data.decode())
+        assert response.status_code == 200
+        assert response_json['status'] == 'success'
+        assert response_json['message'] == SUCCESS_MESSAGES['UPDATED'].format('Favorites order')
+
+        data = response_json['data']
+        assert [each['id'] for each in data] == favorite_ids
+        assert [each['ranking'] for each in data] == list(range(1, len(favorite_ids) + 1))
+
+
+    def test_reorder_with_incomplete_order_fails(
+            self, client, init_db, category_with_favorites):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+            category_with_favorites (Category): Fixture to create a new category with favorites
+        """
+        favorite_ids = [favorite.id for favorite in category_with_favorites.favorites][1:]
+
+        response = client.patch(
+            f'{BASE_URL}/categories/{category_with_favorites.id}/favorites/order',
+            data=json.dumps({'favoriteIds': favorite_ids}),
+            content_type='application/json')
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 400
+        assert data['status'] == 'error'
+        assert data['errors']['favoriteIds'] == [ERROR_MESSAGES['INCOMPLETE_ORDER'].format('category')]
+
+
+    def test_reorder_with_favorite_added_before_the_lock_fails(
+            self, client, init_db, category_with_favorites, monkeypatch):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+            category_with_favorites (Category): Fixture to create a new category with favorites
+            monkeypatch (MonkeyPatch): Fixture to add a favorite while the lock is taken
+        """
+        category_id = category_with_favorites.id
+        favorite_ids = [favorite.id for favorite in category_with_favorites.favorites]
+        rankings = dict(db.session.query(Favorite.id, Favorite.ranking).filter(
+            Favorite.category_id == category_id))
+        engine = Favorite.ranking_engine()
+        lock = engine.lock
+
+        def lock_after_insert(*category_ids):
+            db.session.execute(Favorite.__table__.insert().values(
+                title=fake.alphanumeric(15), ranking=len(favorite_ids) + 1, category_id=category_id))
+            monkeypatch.setattr(engine, 'lock', lock)
+            return lock(*category_ids)
+
+        monkeypatch.setattr(engine, 'lock', lock_after_insert)
+        response = client.patch(
+            f'{BASE_URL}/categories/{category_id}/favorites/order',
+            data=json.dumps({'favoriteIds': list(reversed(favorite_ids))}),
+            content_type='application/json')
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 400
+        assert data['errors']['favoriteIds'] == [ERROR_MESSAGES['INCOMPLETE_ORDER'].format('category')]
+        assert dict(db.session.query(Favorite.id, Favorite.ranking).filter(
+            Favorite.id.in_(favorite_ids))) == rankings
+
+    def test_reorder_an_invalid_category_fails(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+
+        response = client.patch(
+            f'{BASE_URL}/categories/1232/favorites/order',
+            data=json.dumps({'favoriteIds': []}),
+            content_type='application/json')
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 404
+        assert data['message'] == ERROR_MESSAGES['NOT_FOUND'].format('Category')
+
+
 class TestFavoriteResource:
 
     def test_create_favorite_with_valid_data_succeeds(
@@ -472,6 +631,54 @@ class TestFavoriteResource:
         assert data['message'] == 'An error occurred'
         assert data['errors']['categoryId'] == [ERROR_MESSAGES['NOT_FOUND_IDENTIFIER'].format('category')]
 
+    def test_create_favorite_with_existing_title_fails(
+            self, client, init_db, category, favorite):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+            category (Category): Fixture to create a new category
+            favorite (Favorite): Fixture to create a new favorite
+        """
+        payload = {
+            'title' : favorite.title,
+            'ranking' : 1,
+            'categoryId' : category.id
+        }
+
+        response = client.post(
+            f'{BASE_URL}/favorites',
+            data=json.dumps(payload),
+            content_type='application/json')
+
+        data = json.loads(response.data.decode())
+
+        assert response.status_code == 409
+        assert data['status'] == 'error'
+        assert data['message'] == ERROR_MESSAGES['EXISTS'].format('Favorite')
+        assert Favorite.filter(title=favorite.title).count() == 1
+
+    def test_create_without_conflict_checks_succeeds(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        category_id = Category(name=fake.alphanumeric(14)).save().id
+        payload = {'title' : fake.alphanumeric(15), 'ranking' : 1, 'categoryId' : category_id}
+
+        for url, payload in [
+                (f'{BASE_URL}/categories', {'name' : fake.alphanumeric(15)}),
+                (f'{BASE_URL}/favorites', payload)]:
+            with count_queries(db.engine) as statements:
+                response = client.post(url, data=json.dumps(payload), content_type='application/json')
+            assert response.status_code == 201
+
+            # uniqueness and the category are left to the constraints of the INSERT
+            before_insert = statements[:[each.startswith('INSERT') for each in statements].index(True)]
+            assert not [each for each in before_insert if 'FROM categories' in each]
+
     def test_create_favorite_with_incomplete_description_fails(
             self, client, init_db, category):
         """
@@ -523,6 +730,104 @@ class TestFavoriteResource:
         assert data['message'] == SUCCESS_MESSAGES['FETCHED'].format('Favorites')
         assert len(data['data']) > 0
 
+    def test_get_category_favorites_pages_with_cursor_succeeds(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        category = Category(name=fake.alphanumeric(14)).save()
+        titles = [fake.alphanumeric(15) for each in range(5)]
+        for ranking, title in enumerate(titles, 1):
+            Favorite(title=title, ranking=ranking, category_id=category.id).save()
+
+        url = f'{BASE_URL}/categories/{category.id}/favorites'
+        pages, query = [], dict(limit=2)
+        while True:
+            response = client.get(url, query_string=query)
+            data = response.get_json()
+            assert response.status_code == 200
+            pages.append([each['title'] for each in data['data']])
+            if data['meta']['nextCursor'] is None:
+                assert 'Link' not in response.headers
+                break
+            assert response.headers['Link'].endswith('>; rel="next"')
+            assert f"cursor={data['meta']['nextCursor']}" in response.headers['Link']
+            query['cursor'] = data['meta']['nextCursor']
+
+        assert pages == [titles[:2], titles[2:4], titles[4:]]
+
+    def test_get_favorites_without_page_returns_default_page_succeeds(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        category = Category(name=fake.alphanumeric(14)).save()
+        titles = [fake.alphanumeric(15) for each in range(55)]
+        client.post(
+            f'{BASE_URL}/favorites/bulk',
+            data=json.dumps([
+                {'title': title, 'ranking': ranking, 'categoryId': category.id}
+                for ranking, title in enumerate(titles, 1)
+            ]),
+            content_type='application/json')
+
+        response = client.get(f'{BASE_URL}/categories/{category.id}/favorites')
+        data = response.get_json()
+        assert [each['title'] for each in data['data']] == titles[:50]
+        assert data['meta']['limit'] == 50
+        assert 'Link' in response.headers
+
+        response = client.get(
+            f'{BASE_URL}/categories/{category.id}/favorites',
+            query_string=dict(cursor=data['meta']['nextCursor']))
+        data = response.get_json()
+        assert [each['title'] for each in data['data']] == titles[50:]
+        assert data['meta']['nextCursor'] is None
+
+        response = client.get(f'{BASE_URL}/favorites')
+        assert len(response.get_json()['data']) == 50
+
+    def test_get_all_favorites_with_invalid_cursor_fails(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        for cursor in ('not-a-cursor', 'WzEsIDJd'):
+            response = client.get(f'{BASE_URL}/favorites', query_string=dict(cursor=cursor))
+
+            data = response.get_json()
+            assert response.status_code == 400
+            assert data['errors']['cursor'] == ['Not a valid cursor.']
+
+    def test_get_all_favorites_query_count_is_constant(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        def list_favorites(new_categories):
+            for each in range(new_categories):
+                category = Category(name=fake.alphanumeric(14)).save()
+                Favorite(title=fake.alphanumeric(15), ranking=1, category_id=category.id).save()
+                # forget the category so the list cannot reuse it from the session
+                db.session.expunge(category)
+
+            with count_queries(db.engine) as statements:
+                response = client.get(f'{BASE_URL}/favorites')
+            assert response.status_code == 200
+            assert all(each['category']['name'] for each in response.get_json()['data'])
+            return len(statements)
+
+        # the validators of the list, then the favorites with their categories
+        assert list_favorites(2) == list_favorites(4) == 2
+
 
 class TestSingleFavoriteResource:
 
@@ -573,6 +878,8 @@ class TestSingleFavoriteResource:
             init_db(SQLAlchemy): fixture to initialize the test database
             favorite (Favorite): Fixture to create a new favorite
         """
+        # rankings past the last favorite of the category are clamped
+        Favorite(title=fake.alphanumeric(15), ranking=2, category_id=favorite.category_id).save()
         params = {
             'ranking' : 2,
             'metaData' : {
@@ -654,6 +961,96 @@ class TestAuditCategoryResource:
         assert data['message'] == SUCCESS_MESSAGES['FETCHED'].format('Audits')
         assert len(data['data']) > 0
 
+    def test_get_categories_audits_pages_with_cursor_succeeds(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        resource_id = 9001
+        ids = [
+            Audit(resource_id=resource_id, resource_type='CATEGORY',
+                  action='UPDATED', activity=fake.alphanumeric(20)).save().id
+            for each in range(5)
+        ]
+
+        pages, query = [], dict(resourceId=resource_id, limit=2)
+        while True:
+            response = client.get(f'{BASE_URL}/categories/audits', query_string=query)
+            data = json.loads(response.data.decode())
+            assert response.status_code == 200
+            pages.append([audit['id'] for audit in data['data']])
+            if data['meta']['nextCursor'] is None:
+                break
+            query['cursor'] = data['meta']['nextCursor']
+
+        assert pages == [ids[4:2:-1], ids[2:0:-1], ids[:1]]
+
+    def test_get_categories_audits_without_page_returns_default_page_succeeds(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        resource_id = 9003
+        db.session.execute(Audit.__table__.insert(), [
+            {'resource_id': resource_id, 'resource_type': 'CATEGORY',
+             'action': 'UPDATED', 'activity': fake.alphanumeric(20)}
+            for each in range(55)
+        ])
+        db.session.commit()
+
+        response = client.get(f'{BASE_URL}/categories/audits?resourceId={resource_id}')
+
+        data = json.loads(response.data.decode())
+        assert len(data['data']) == 50
+        assert data['meta']['limit'] == 50
+
+        response = client.get(
+            f'{BASE_URL}/categories/audits',
+            query_string=dict(resourceId=resource_id, cursor=data['meta']['nextCursor']))
+
+        data = json.loads(response.data.decode())
+        assert len(data['data']) == 5
+        assert data['meta']['nextCursor'] is None
+
+    def test_get_categories_audits_filters_by_action_succeeds(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        resource_id = 9002
+        for action in ('ADDED', 'UPDATED', 'UPDATED'):
+            Audit(resource_id=resource_id, resource_type='CATEGORY',
+                  action=action, activity=fake.alphanumeric(20)).save()
+
+        response = client.get(
+            f'{BASE_URL}/categories/audits?resourceId={resource_id}&action=UPDATED'
+            '&createdFrom=2019-01-01T00:00:00')
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 200
+        assert [audit['action'] for audit in data['data']] == ['UPDATED', 'UPDATED']
+        assert data['meta']['nextCursor'] is None
+
+    def test_get_categories_audits_with_invalid_limit_fails(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        response = client.get(f'{BASE_URL}/categories/audits?limit=500')
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 400
+        assert data['status'] == 'error'
+        assert 'limit' in data['errors']
+
 
 class TestAuditFavoriteResource:
 
@@ -673,4 +1070,549 @@ class TestAuditFavoriteResource:
         assert response.status_code == 200
         assert data['status'] == 'success'
         assert data['message'] == SUCCESS_MESSAGES['FETCHED'].format('Audits')
-        assert len(data['data']) > 0
\ No newline at end of file
+        assert len(data['data']) > 0
+
+
+class TestSingleResourceAuditResource:
+
+    def test_get_favorite_audits_succeeds(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        payload = {
+            'title' : fake.alphanumeric(10),
+            'ranking' : 1,
+            'categoryId' : Category(name=fake.alphanumeric(14)).save().id
+        }
+        response = client.post(
+            f'{BASE_URL}/favorites', data=json.dumps(payload), content_type='application/json')
+        favorite_id = response.get_json()['data']['id']
+        client.put(
+            f'{BASE_URL}/favorites/{favorite_id}',
+            data=json.dumps({'title': fake.alphanumeric(10)}), content_type='application/json')
+
+        response = client.get(
+            f'{BASE_URL}/favorites/{favorite_id}/audits', query_string=dict(limit=1))
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 200
+        assert data['message'] == SUCCESS_MESSAGES['FETCHED'].format('Audits')
+        assert [(audit['resource_id'], audit['action']) for audit in data['data']] == [
+            (favorite_id, 'UPDATED')]
+        assert data['meta']['nextCursor'] is not None
+
+    def test_get_category_audits_succeeds(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        response = client.post(
+            f'{BASE_URL}/categories',
+            data=json.dumps({'name' : fake.alphanumeric(14)}), content_type='application/json')
+        category_id = response.get_json()['data']['id']
+
+        response = client.get(f'{BASE_URL}/categories/{category_id}/audits')
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 200
+        assert [(audit['resource_type'], audit['action']) for audit in data['data']] == [
+            ('CATEGORY', 'ADDED')]
+        assert data['meta']['nextCursor'] is None
+
+
+class TestNdjsonStreaming:
+
+    def test_stream_category_favorites_succeeds(
+            self, client, init_db, app, monkeypatch):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+            app (Flask): Fixture to get the flask app
+            monkeypatch (MonkeyPatch): Fixture to shrink the stream batches
+        """
+        monkeypatch.setitem(app.config, 'STREAM_BATCH_SIZE', 2)
+        category = Category(name=fake.alphanumeric(14)).save()
+        titles = [fake.alphanumeric(15) for each in range(5)]
+        for ranking, title in enumerate(titles, 1):
+            Favorite(title=title, ranking=ranking, category_id=category.id).save()
+
+        response = client.get(
+            f'{BASE_URL}/categories/{category.id}/favorites',
+            headers={'Accept': 'application/x-ndjson'})
+
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        rows = [json.loads(line) for line in response.data.decode().splitlines()]
+        assert [(row['title'], row['ranking']) for row in rows] == [
+            (title, ranking) for ranking, title in enumerate(titles, 1)]
+
+    def test_stream_categories_and_audits_succeeds(
+            self, client, init_db, app, monkeypatch):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+            app (Flask): Fixture to get the flask app
+            monkeypatch (MonkeyPatch): Fixture to shrink the stream batches
+        """
+        monkeypatch.setitem(app.config, 'STREAM_BATCH_SIZE', 2)
+        category_ids = [Category(name=fake.alphanumeric(14)).save().id for each in range(3)]
+
+        response = client.get(f'{BASE_URL}/categories', query_string=dict(stream=1))
+        rows = [json.loads(line) for line in response.data.decode().splitlines()]
+        assert response.mimetype == 'application/x-ndjson'
+        assert set(category_ids) <= {row['id'] for row in rows}
+        assert len(rows) == Category.query.count()
+
+        response = client.get(f'{BASE_URL}/categories/audits', query_string=dict(stream=1))
+        rows = [json.loads(line) for line in response.data.decode().splitlines()]
+        assert [row['id'] for row in rows] == sorted((row['id'] for row in rows), reverse=True)
+        assert set(category_ids) <= {row['resource_id'] for row in rows}
+
+
+class TestSparseFieldsets:
+
+    def test_get_favorites_with_fields_succeeds(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        category = Category(name=fake.alphanumeric(14)).save()
+        favorite = Favorite(
+            title=fake.alphanumeric(15), description=fake.alphanumeric(200), ranking=1,
+            meta_data={'color': 'red'}, category_id=category.id).save()
+
+        with count_queries(db.engine) as statements:
+            response = client.get(
+                f'{BASE_URL}/categories/{category.id}/favorites',
+                query_string=dict(fields='title,ranking'))
+
+        assert response.status_code == 200
+        assert response.get_json()['data'] == [
+            dict(id=favorite.id, title=favorite.title, ranking=1)]
+        selected = statements[-1].split('FROM')[0]
+        assert 'description' not in selected and 'meta_data' not in selected
+
+        response = client.get(
+            f'{BASE_URL}/favorites/{favorite.id}', query_string=dict(fields='metaData,category'))
+        assert response.get_json()['data'] == dict(
+            id=favorite.id, metaData={'color': 'red'},
+            category=dict(id=category.id, name=category.name))
+
+    def test_get_favorites_with_unknown_fields_fails(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        response = client.get(
+            f'{BASE_URL}/favorites', query_string=dict(fields='title,categoryId,secret'))
+
+        data = response.get_json()
+        assert response.status_code == 400
+        assert data['message'] == ERROR_MESSAGES['UNKNOWN_FIELDS'].format('categoryId, secret')
+        assert data['errors']['fields'] == ['categoryId', 'secret']
+
+
+class TestConditionalRequests:
+
+    def test_get_categories_not_modified_succeeds(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        response = client.get(f'{BASE_URL}/categories')
+        etag = response.headers['ETag']
+        assert etag.startswith('W/"')
+
+        with count_queries(db.engine) as statements:
+            response = client.get(f'{BASE_URL}/categories', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+        assert len(statements) == 1
+
+        category = Category(name=fake.alphanumeric(14)).save()
+        response = client.get(f'{BASE_URL}/categories', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+        etag = response.headers['ETag']
+        Favorite(title=fake.alphanumeric(15), ranking=1, category_id=category.id).save()
+        response = client.get(f'{BASE_URL}/categories', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+
+    def test_get_category_favorites_not_modified_succeeds(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        category, other = [Category(name=fake.alphanumeric(14)).save() for each in range(2)]
+        favorite = Favorite(title=fake.alphanumeric(15), ranking=1, category_id=category.id).save()
+        url = f'{BASE_URL}/categories/{category.id}/favorites'
+
+        response = client.get(url)
+        etag, last_modified = response.headers['ETag'], response.headers['Last-Modified']
+
+        # changes to other categories keep the list valid
+        Favorite(title=fake.alphanumeric(15), ranking=1, category_id=other.id).save()
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+        assert client.get(url, headers={'If-Modified-Since': last_modified}).status_code == 304
+        # another representation of the same rows has its own validator
+        assert client.get(
+            url, query_string=dict(fields='title'),
+            headers={'If-None-Match': etag}).status_code == 200
+
+        favorite.delete()
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 200
+
+    def test_get_category_favorites_modified_since_removal_succeeds(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        category, other = [Category(name=fake.alphanumeric(14)).save() for each in range(2)]
+        deleted, moved, kept = [
+            Favorite(title=fake.alphanumeric(15), ranking=1, category_id=category.id).save()
+            for each in range(3)
+        ]
+        url = f'{BASE_URL}/categories/{category.id}/favorites'
+
+        def last_modified_an_hour_ago():
+            # validators only have a one second resolution
+            an_hour_ago = datetime.utcnow() - timedelta(hours=1)
+            for model in (Category, Favorite):
+                db.session.execute(model.__table__.update().values(
+                    created_date=an_hour_ago, modified_date=None))
+            db.session.commit()
+            return client.get(url).headers['Last-Modified']
+
+        last_modified = last_modified_an_hour_ago()
+        deleted.delete()
+        response = client.get(url, headers={'If-Modified-Since': last_modified})
+        assert response.status_code == 200
+        assert len(response.get_json()['data']) == 2
+
+        last_modified = last_modified_an_hour_ago()
+        Favorite.get(moved.id).update(category_id=other.id)
+        response = client.get(url, headers={'If-Modified-Since': last_modified})
+        assert response.status_code == 200
+        assert [each['id'] for each in response.get_json()['data']] == [kept.id]
+
+        last_modified = last_modified_an_hour_ago()
+        response = client.get(url, headers={'If-Modified-Since': last_modified})
+        assert response.status_code == 304
+
+
+    def test_get_categories_modified_since_category_removal_succeeds(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        deleted, kept = [Category(name=fake.alphanumeric(14)).save() for each in range(2)]
+        an_hour_ago = datetime.utcnow() - timedelta(hours=1)
+        for model in (Category, Favorite):
+            db.session.execute(model.__table__.update().values(
+                created_date=an_hour_ago, modified_date=None))
+        db.session.commit()
+        last_modified = (an_hour_ago + timedelta(seconds=1)).strftime('%a, %d %b %Y %H:%M:%S GMT')
+
+        response = client.get(f'{BASE_URL}/categories')
+        assert 'Last-Modified' not in response.headers
+
+        Category.get(deleted.id).delete()
+        response = client.get(
+            f'{BASE_URL}/categories', headers={'If-Modified-Since': last_modified})
+
+        assert response.status_code == 200
+        ids = [each['id'] for each in response.get_json()['data']]
+        assert kept.id in ids and deleted.id not in ids
+
+class TestBulkCreate:
+
+    def test_bulk_create_categories_succeeds(self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        names = [fake.alphanumeric(15) for each in range(3)]
+
+        response = client.post(
+            f'{BASE_URL}/categories/bulk',
+            data=json.dumps([{'name': name} for name in names]),
+            content_type='application/json')
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 201
+        assert [each['name'] for each in data['data']] == names
+        assert [each['favoritesCount'] for each in data['data']] == [0, 0, 0]
+        for each in data['data']:
+            assert [audit.action for audit in Audit.filter(
+                resource_type='CATEGORY', resource_id=each['id'])] == ['ADDED']
+
+    def test_bulk_create_categories_with_invalid_items_fails(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        category = Category(name=fake.alphanumeric(14)).save()
+        name = fake.alphanumeric(15)
+        payload = [{'name': name}, {'name': category.name}, {}, {'name': name}]
+
+        response = client.post(
+            f'{BASE_URL}/categories/bulk',
+            data=json.dumps(payload),
+            content_type='application/json')
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 400
+        assert data['message'] == ERROR_MESSAGES['DEFAULT']
+        assert data['errors'] == {
+            '1': {'name': [ERROR_MESSAGES['EXISTS'].format('Category')]},
+            '2': {'name': [ERROR_MESSAGES['REQUIRED_FIELD']]},
+            '3': {'name': [ERROR_MESSAGES['EXISTS'].format('Category')]},
+        }
+        assert Category.filter(name=name).count() == 0
+
+    def test_bulk_create_favorites_succeeds(self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        category, other = [Category(name=fake.alphanumeric(14)).save() for each in range(2)]
+        existing = Favorite(title=fake.alphanumeric(15), ranking=1, category_id=category.id).save()
+        payload = [
+            {'title': fake.alphanumeric(15), 'ranking': 1, 'categoryId': category.id,
+             'metaData': {'color': 'red'}},
+            {'title': fake.alphanumeric(15), 'ranking': 5, 'categoryId': category.id},
+            {'title': fake.alphanumeric(15), 'ranking': 1, 'categoryId': other.id},
+        ]
+
+        response = client.post(
+            f'{BASE_URL}/favorites/bulk',
+            data=json.dumps(payload),
+            content_type='application/json')
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 201
+        assert [each['title'] for each in data['data']] == [each['title'] for each in payload]
+        assert [each['ranking'] for each in data['data']] == [1, 3, 1]
+        assert data['data'][0]['metaData'] == {'color': 'red'}
+        assert data['data'][2]['category']['id'] == other.id
+
+        titles = [each.title for each in category.favorites.order_by(Favorite.ranking)]
+        assert titles == [payload[0]['title'], existing.title, payload[1]['title']]
+        assert Audit.filter(resource_type='FAVORITE', action='ADDED').filter(
+            Audit.resource_id.in_([each['id'] for each in data['data']])).count() == 3
+
+    def test_bulk_create_favorites_with_invalid_items_fails(
+            self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        category_id = Category(name=fake.alphanumeric(14)).save().id
+        favorite = Favorite(title=fake.alphanumeric(15), ranking=1, category_id=category_id).save()
+        title = fake.alphanumeric(15)
+        payload = [
+            {'title': title, 'ranking': 1, 'categoryId': category_id},
+            {'title': favorite.title, 'ranking': 1, 'categoryId': 2121},
+            {'title': title, 'ranking': 1, 'categoryId': category_id},
+            {'title': fake.alphanumeric(15), 'categoryId': category_id},
+        ]
+
+        response = client.post(
+            f'{BASE_URL}/favorites/bulk',
+            data=json.dumps(payload),
+            content_type='application/json')
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 400
+        assert data['errors'] == {
+            '1': {
+                'categoryId': [ERROR_MESSAGES['NOT_FOUND_IDENTIFIER'].format('category')],
+                'title': [ERROR_MESSAGES['EXISTS'].format('Favorite')],
+            },
+            '2': {'title': [ERROR_MESSAGES['EXISTS'].format('Favorite')]},
+            '3': {'ranking': [ERROR_MESSAGES['REQUIRED_FIELD']]},
+        }
+        assert Favorite.filter(title=title).count() == 0
+
+    def test_bulk_create_with_invalid_payload_fails(self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        for payload in ({'title': fake.alphanumeric(15)}, []):
+            response = client.post(
+                f'{BASE_URL}/favorites/bulk',
+                data=json.dumps(payload),
+                content_type='application/json')
+
+            data = json.loads(response.data.decode())
+            assert response.status_code == 400
+            assert data['message'] == ERROR_MESSAGES['BULK_PAYLOAD'].format(500)
+
+    def test_bulk_create_favorites_query_count_is_constant(self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        category_ids = [Category(name=fake.alphanumeric(14)).save().id for each in range(2)]
+
+        def create(size):
+            payload = [
+                {'title': fake.alphanumeric(15), 'ranking': 1, 'categoryId': category_ids[each % 2]}
+                for each in range(size)
+            ]
+            with count_queries(db.engine) as statements:
+                response = client.post(
+                    f'{BASE_URL}/favorites/bulk',
+                    data=json.dumps(payload),
+                    content_type='application/json')
+            assert response.status_code == 201
+            return len(statements)
+
+        assert create(2) == create(20)
+
+
+class TestBulkDelete:
+
+    def test_bulk_delete_favorites_succeeds(self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        category, other = [Category(name=fake.alphanumeric(14)).save() for each in range(2)]
+        favorites = [
+            Favorite(title=fake.alphanumeric(15), ranking=each, category_id=category.id).save()
+            for each in range(1, 6)
+        ]
+        moved = Favorite(title=fake.alphanumeric(15), ranking=1, category_id=other.id).save()
+        kept = [favorites[1], favorites[3]]
+        ids = [favorites[0].id, favorites[2].id, favorites[4].id, moved.id]
+
+        response = client.delete(
+            f'{BASE_URL}/favorites', query_string=dict(ids=','.join(map(str, ids))))
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 200
+        assert data['message'] == SUCCESS_MESSAGES['DELETED'].format('Favorites')
+        assert data['data']['ids'] == sorted(ids)
+        assert Favorite.query.filter(Favorite.id.in_(ids)).count() == 0
+        assert [(each.title, each.ranking) for each in category.favorites.order_by(Favorite.ranking)] \
+            == [(each.title, position) for position, each in enumerate(kept, start=1)]
+        assert Audit.filter(resource_type='FAVORITE', action='REMOVED').filter(
+            Audit.resource_id.in_(ids)).count() == 4
+
+    def test_bulk_delete_favorites_from_body_succeeds(self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        category_id = Category(name=fake.alphanumeric(14)).save().id
+        ids = [
+            Favorite(title=fake.alphanumeric(15), ranking=1, category_id=category_id).save().id
+            for each in range(2)
+        ]
+
+        response = client.delete(
+            f'{BASE_URL}/favorites', data=json.dumps({'ids': ids}), content_type='application/json')
+
+        assert response.status_code == 200
+        assert Favorite.filter(category_id=category_id).count() == 0
+
+    def test_bulk_delete_with_unknown_ids_fails(self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        category_id = Category(name=fake.alphanumeric(14)).save().id
+        favorite = Favorite(title=fake.alphanumeric(15), ranking=1, category_id=category_id).save()
+
+        response = client.delete(f'{BASE_URL}/favorites?ids={favorite.id},999999')
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 404
+        assert data['errors'] == {'ids': [999999]}
+        assert Favorite.get(favorite.id) is not None
+
+        for ids in ('', 'one,2'):
+            response = client.delete(f'{BASE_URL}/favorites?ids={ids}')
+            assert response.status_code == 400
+
+    def test_bulk_delete_of_concurrently_deleted_ids_fails(self, client, init_db, monkeypatch):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+            monkeypatch (MonkeyPatch): Fixture to delete a favorite while the locks are taken
+        """
+        category_id = Category(name=fake.alphanumeric(14)).save().id
+        kept, deleted = [
+            Favorite(title=fake.alphanumeric(15), ranking=1, category_id=category_id).save().id
+            for each in range(2)
+        ]
+        engine = Favorite.ranking_engine()
+        lock = engine.lock
+
+        def lock_after_delete(*category_ids):
+            db.session.execute(Favorite.__table__.delete().where(Favorite.id == deleted))
+            monkeypatch.setattr(engine, 'lock', lock)
+            return lock(*category_ids)
+
+        monkeypatch.setattr(engine, 'lock', lock_after_delete)
+        response = client.delete(f'{BASE_URL}/favorites?ids={kept},{deleted}')
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 404
+        assert data['errors'] == {'ids': [deleted]}
+        assert Favorite.get(kept) is not None
+
+    def test_bulk_delete_reranks_each_category_once(self, client, init_db):
+        """
+        Parameters:
+            client(FlaskClient): fixture to get flask test client
+            init_db(SQLAlchemy): fixture to initialize the test database
+        """
+        category_ids = [Category(name=fake.alphanumeric(14)).save().id for each in range(2)]
+
+        def delete(size):
+            ids = [
+                Favorite(title=fake.alphanumeric(15), ranking=1,
+                         category_id=category_ids[each % 2]).save().id
+                for each in range(size)
+            ]
+            with count_queries(db.engine) as statements:
+                response = client.delete(
+                    f'{BASE_URL}/favorites', query_string=dict(ids=','.join(map(str, ids))))
+            assert response.status_code == 200
+            return len(statements)
+
+        assert delete(2) == delete(20)